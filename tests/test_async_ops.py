@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the asyncio database API. The PostgreSQL tests run a real
+PGConnectionPool and the pgsql_db_ops functions over fake psycopg2
+connections, so no server is needed.
+"""
+
+import asyncio
+import threading
+import time
+import warnings
+
+import pytest
+
+from utilities.database import async_ops, pgsql_db_ops
+
+#-------------------------------------------------------------------------------
+class FakeServer:
+    """ Records the statements run on its connections, each taking delay
+    seconds, and the most statements seen in flight at once.
+    """
+
+    def __init__(self, delay: float = 0.0, rows: list = (), columns: list = ()):
+        self.delay = delay
+        self.rows = list(rows)
+        self.columns = list(columns)
+        self.statements = []
+        self.commits = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def pool_class(self):
+        """ Returns stand-in for psycopg2's ThreadedConnectionPool handing out
+        connections to this server.
+        """
+        server = self
+
+        class FakeThreadedPool:
+            def __init__(self, minconn, maxconn, **kwargs):
+                self.closed = False
+
+            def getconn(self):
+                return FakeConnection(server)
+
+            def putconn(self, conn, close=False):
+                pass
+
+            def closeall(self):
+                self.closed = True
+        return FakeThreadedPool
+
+
+class FakeConnection:
+    closed = 0
+    encoding = 'UTF8'
+
+    def __init__(self, server: FakeServer):
+        self.server = server
+
+    def cursor(self, name=None):
+        return FakeCursor(self)
+
+    def commit(self):
+        with self.server.lock:
+            self.server.commits += 1
+
+    def rollback(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, connection: FakeConnection):
+        self.connection = connection
+        self.rowcount = -1
+        self.description = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def close(self):
+        pass
+
+    def mogrify(self, template, args):
+        return template.replace(b'%s', b'?') + repr(tuple(args)).encode()
+
+    def execute(self, statement, params=None):
+        server = self.connection.server
+        if isinstance(statement, bytes):
+            statement = statement.decode()
+        with server.lock:
+            server.statements.append(statement)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(server.delay)
+        with server.lock:
+            server.in_flight -= 1
+        self.rowcount = len(server.rows)
+        self.description = [(name,) for name in server.columns]
+
+    def fetchall(self):
+        return list(self.connection.server.rows)
+
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    server = FakeServer()
+    monkeypatch.setattr(pgsql_db_ops.pg_pool, 'ThreadedConnectionPool', server.pool_class())
+    return server
+
+#-------------------------------------------------------------------------------
+def test_pg_pool_bounds_concurrency(fake_server):
+    fake_server.delay = 0.05
+    pool = pgsql_db_ops.PGConnectionPool('user', '', 'db', maxconn=10, health_check=False)
+
+    async def run():
+        async with async_ops.AsyncPGPool(pool, max_concurrency=3) as async_pool:
+            # The event loop stays free while calls wait for a slot
+            ticks = 0
+
+            async def tick():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.005)
+                    ticks += 1
+
+            ticker = asyncio.create_task(tick())
+            await asyncio.gather(*(async_pool.execute('SELECT 1') for _ in range(12)))
+            ticker.cancel()
+            return ticks
+
+    ticks = asyncio.run(run())
+    assert fake_server.max_in_flight == 3
+    assert fake_server.statements == ['SELECT 1'] * 12
+    assert fake_server.commits == 12
+    assert ticks > 0
+
+#-------------------------------------------------------------------------------
+def test_pg_pool_runs_pgsql_db_ops(fake_server):
+    fake_server.rows = [(1, 'a'), (2, 'b')]
+    fake_server.columns = ['id', 'name']
+    pool = pgsql_db_ops.PGConnectionPool('user', '', 'db', maxconn=4)
+
+    async def run():
+        async with async_ops.AsyncPGPool(pool, max_concurrency=4) as async_pool:
+            batch = await async_pool.execute_batch('INSERT INTO items (id, name) VALUES %s',
+                                                   [(4, 'd'), (5, 'e')])
+            with warnings.catch_warnings():
+                # pandas warns about DBAPI connections other than sqlite3
+                warnings.simplefilter('ignore', UserWarning)
+                results = await asyncio.gather(*(async_pool.query('SELECT * FROM items')
+                                                 for _ in range(4)))
+            return batch, results
+
+    batch, results = asyncio.run(run())
+    assert batch['rows'] == 2
+    assert "INSERT INTO items (id, name) VALUES (?,?)(4, 'd'),(?,?)(5, 'e')" in fake_server.statements
+    for df in results:
+        assert df['id'].tolist() == [1, 2]
+        assert df['name'].tolist() == ['a', 'b']
+    # Health checks run before each checkout
+    assert fake_server.statements.count('SELECT 1') == 5
+    assert pool._pool.closed
+
+#-------------------------------------------------------------------------------
+def test_sqlite_connection_round_trip(tmp_path):
+    csv_path = tmp_path / 'upload.csv'
+    csv_path.write_text('a,b\n1,x\n2,y\n')
+
+    async def run():
+        async with await async_ops.connect_sqlite_db_async(str(tmp_path / 'lite.db')) as conn:
+            await conn.execute('CREATE TABLE t (a INTEGER)')
+            await asyncio.gather(*(conn.execute('INSERT INTO t VALUES (?)', (i,))
+                                   for i in range(100)))
+            await conn.commit()
+            stats = await conn.upload(str(csv_path), 'u')
+            return (await conn.query('SELECT count(*), sum(a) FROM t'),
+                    await conn.query('SELECT * FROM u'), stats)
+
+    totals, rows, stats = asyncio.run(run())
+    assert totals == [(100, 4950)]
+    assert rows == [(1, 'x'), (2, 'y')]
+    assert stats['rows'] == 2
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the statement timing statistics.
+"""
+
+import pytest
+
+from utilities.database import instrumentation
+
+#-------------------------------------------------------------------------------
+@pytest.fixture(autouse=True)
+def recording():
+    instrumentation.reset()
+    yield
+    # Restore the default settings
+    instrumentation.enable()
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+def test_histogram_covers_recent_window():
+    instrumentation.enable(window=3)
+    for seconds in (5.0, 5.0, 0.00005, 0.005, 0.005):
+        instrumentation.record('sqlite', 'SELECT 1', seconds)
+    stats = instrumentation.get_stats()['statements'][0]
+    assert stats['count'] == 5
+    assert stats['histogram']['le_0.0001'] == 1
+    assert stats['histogram']['le_0.01'] == 2
+    assert stats['histogram']['le_10.0'] == 0
+    assert sum(stats['histogram'].values()) == 3
+
+
+def test_enable_resizes_existing_windows():
+    instrumentation.enable(window=10)
+    for seconds in range(10):
+        instrumentation.record('sqlite', 'SELECT 1', seconds / 1000)
+    instrumentation.enable(window=2)
+    instrumentation.record('sqlite', 'SELECT 1', 0.5)
+    stats = instrumentation.get_stats()['statements'][0]
+    assert sum(stats['histogram'].values()) == 2
+    assert stats['p50_seconds'] == 0.5
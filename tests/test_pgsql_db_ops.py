@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the data preparation behind the PostgreSQL COPY upload, which need
+no server.
+"""
+
+import pandas as pd
+
+from utilities.database import pgsql_db_ops
+
+#-------------------------------------------------------------------------------
+def test_copy_chunks_uses_dataframe_dtypes():
+    df = pd.DataFrame({'flag': [True, False], 'time': pd.to_datetime(['2025-01-01', '2025-01-02']),
+                       'n': [1, 2], 'x': [0.5, 1.5], 's': ['a', 'b']})
+    columns, schema, _ = pgsql_db_ops._copy_chunks(df, None, 100, ',')
+    assert columns == ['flag', 'time', 'n', 'x', 's']
+    assert schema == {'flag': 'BOOLEAN', 'time': 'TIMESTAMP', 'n': 'BIGINT',
+                      'x': 'DOUBLE PRECISION', 's': 'TEXT'}
+
+
+def test_copy_chunks_skips_blank_csv_lines(tmp_path):
+    csv_path = tmp_path / 'blank.csv'
+    csv_path.write_text('a,b\n1,x\n\n2,y\n\n')
+    columns, schema, buffers = pgsql_db_ops._copy_chunks(str(csv_path), None, 100, ',')
+    assert columns == ['a', 'b']
+    assert schema == {'a': 'BIGINT', 'b': 'TEXT'}
+    assert ''.join(buffer.read() for buffer in buffers).splitlines() == ['1,x', '2,y']
+
+
+def test_copy_chunks_keeps_none_apart_from_empty_strings():
+    _, _, buffers = pgsql_db_ops._copy_chunks([(1, None), (2, '')], ['id', 's'], 100, ',')
+    assert ''.join(buffer.read() for buffer in buffers).splitlines() == ['1,\\N', '2,']
+    df = pd.DataFrame({'s': [None, ''], 'x': [float('nan'), 1.0]})
+    _, _, buffers = pgsql_db_ops._copy_chunks(df, None, 100, ',')
+    assert ''.join(buffer.read() for buffer in buffers).splitlines() == ['\\N,\\N', ',1.0']
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for Quantity arithmetic, comparison and NumPy interoperation.
+"""
+
+import numpy as np
+import pytest
+
+from utilities.units.quantity import Quantity
+
+#-------------------------------------------------------------------------------
+def test_add_converts_to_left_unit():
+    total = Quantity([1.0, 2.0], 'mile') + Quantity([5280.0, 5280.0], 'foot')
+    assert total.unit == 'mile'
+    np.testing.assert_allclose(total.value, [2.0, 3.0])
+
+
+def test_sum_of_quantities():
+    total = sum([Quantity([1.0], 'foot'), Quantity([2.0], 'foot')])
+    assert total.unit == 'foot'
+    np.testing.assert_allclose(total.value, [3.0])
+
+
+def test_comparison_with_other_types():
+    q = Quantity([1.0], 'foot')
+    assert (q == None) is False
+    assert q not in [None]
+    with pytest.raises(TypeError):
+        q < 1
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize('left', [np.array([2.0, 3.0]), np.float64(2.0), 2])
+def test_multiply_with_numpy_on_left_keeps_unit(left):
+    q = Quantity([1.0, 2.0], 'foot')
+    product = left * q
+    assert isinstance(product, Quantity)
+    assert product.unit == 'foot'
+    np.testing.assert_allclose(product.value, np.asarray(left) * [1.0, 2.0])
+
+
+@pytest.mark.parametrize('left', [np.array([1.0, 2.0]), np.float64(1.0), 1.0])
+def test_add_unitless_on_left_raises(left):
+    with pytest.raises(TypeError):
+        left + Quantity([1.0, 2.0], 'foot')
+    with pytest.raises(TypeError):
+        Quantity([1.0, 2.0], 'foot') + left
+
+
+@pytest.mark.parametrize('func', [np.sum, np.mean, np.min, np.max, np.std])
+def test_numpy_reductions_keep_unit(func):
+    q = Quantity([1.0, 2.0, 4.0], 'foot')
+    result = func(q)
+    assert isinstance(result, Quantity)
+    assert result.unit == 'foot'
+    np.testing.assert_allclose(result.value, func(q.value))
+
+
+def test_asarray_gives_values():
+    np.testing.assert_array_equal(np.asarray(Quantity([1.0, 2.0], 'foot')), [1.0, 2.0])
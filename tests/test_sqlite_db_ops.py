@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the SQLite streaming upload and query cache.
+"""
+
+import sqlite3
+
+import pytest
+
+from utilities.database import sqlite_db_ops
+
+#-------------------------------------------------------------------------------
+def test_stream_upload_rejects_unknown_if_exists(tmp_path):
+    csv_path = tmp_path / 'upload.csv'
+    csv_path.write_text('a\n1\n')
+    conn = sqlite3.connect(str(tmp_path / 'lite.db'))
+    with pytest.raises(ValueError):
+        sqlite_db_ops.stream_upload_table(conn, str(csv_path), 't', if_exists='Replace')
+    assert conn.execute("SELECT count(*) FROM sqlite_master WHERE name = 't'").fetchone() == (0,)
+    conn.close()
+
+#-------------------------------------------------------------------------------
+def test_query_cache_invalidates_on_write(tmp_path):
+    db_path = str(tmp_path / 'cache.db')
+    writer = sqlite3.connect(db_path)
+    writer.execute('CREATE TABLE t (a INTEGER)')
+    writer.execute('INSERT INTO t VALUES (1)')
+    writer.commit()
+    reader = sqlite3.connect(db_path)
+    cache = sqlite_db_ops.QueryCache()
+
+    assert cache.query(reader, 'SELECT a FROM t WHERE a >= ?', (0,)) == [(1,)]
+    assert cache.query(reader, 'SELECT a FROM t WHERE a >= ?', (0,)) == [(1,)]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Different parameters are cached separately
+    assert cache.query(reader, 'SELECT a FROM t WHERE a >= ?', (2,)) == []
+    assert cache.misses == 2
+
+    # A write through another connection changes the database file
+    writer.executemany('INSERT INTO t VALUES (?)', [(i,) for i in range(2, 2000)])
+    writer.commit()
+    assert len(cache.query(reader, 'SELECT a FROM t WHERE a >= ?', (0,))) == 1999
+    assert cache.invalidations == 1
+    writer.close()
+    reader.close()
+
+
+def test_query_cache_returns_copies(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'cache.db'))
+    conn.execute('CREATE TABLE t (a INTEGER)')
+    conn.execute('INSERT INTO t VALUES (1)')
+    conn.commit()
+    cache = sqlite_db_ops.QueryCache()
+
+    cache.query(conn, 'SELECT a FROM t').append((2,))
+    rows = cache.query(conn, 'SELECT a FROM t')
+    rows.clear()
+    assert cache.query(conn, 'SELECT a FROM t') == [(1,)]
+    conn.close()
+
+
+def test_query_cache_bypassed_in_transaction_and_memory(tmp_path):
+    cache = sqlite_db_ops.QueryCache()
+    memory = sqlite3.connect(':memory:')
+    memory.execute('CREATE TABLE t (a INTEGER)')
+    cache.query(memory, 'SELECT a FROM t')
+    conn = sqlite3.connect(str(tmp_path / 'cache.db'))
+    conn.execute('CREATE TABLE t (a INTEGER)')
+    conn.execute('INSERT INTO t VALUES (1)')
+    assert conn.in_transaction
+    assert cache.query(conn, 'SELECT a FROM t') == [(1,)]
+    assert (cache.hits, cache.misses) == (0, 0)
+    memory.close()
+    conn.close()
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for resuming table transfers from a checkpoint.
+"""
+
+import json
+import sqlite3
+
+import pytest
+
+from utilities import utils_file
+from utilities.database import transfer
+
+#-------------------------------------------------------------------------------
+def test_interrupted_checkpoint_write_keeps_previous(tmp_path, monkeypatch):
+    source = sqlite3.connect(str(tmp_path / 'source.db'))
+    source.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT)')
+    source.executemany('INSERT INTO t VALUES (?, ?)', [(i, str(i)) for i in range(6)])
+    source.commit()
+    dest = sqlite3.connect(str(tmp_path / 'dest.db'))
+    checkpoint_path = str(tmp_path / 'checkpoint.json')
+
+    dump = json.dump
+    calls = []
+
+    def failing_dump(obj, out_file, **kwargs):
+        calls.append(obj)
+        if len(calls) == 2:
+            out_file.write('{"table": ')
+            raise KeyboardInterrupt
+        dump(obj, out_file, **kwargs)
+
+    monkeypatch.setattr(transfer.json, 'dump', failing_dump)
+    with pytest.raises(KeyboardInterrupt):
+        transfer.transfer_table(source, dest, 't', order_by='id', chunk_rows=2,
+                                checkpoint_path=checkpoint_path)
+    monkeypatch.setattr(transfer.json, 'dump', dump)
+
+    assert utils_file.read_json_file(checkpoint_path)['last_key'] == 1
+    stats = transfer.transfer_table(source, dest, 't', order_by='id', chunk_rows=2,
+                                    checkpoint_path=checkpoint_path)
+    assert stats['resumed_from'] == 1
+    # The chunk written before the failed checkpoint is written again
+    assert dest.execute('SELECT DISTINCT id FROM t ORDER BY id').fetchall() == [(i,) for i in range(6)]
+    assert not list(tmp_path.glob('checkpoint*'))
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for invalidation and eviction in the file cache.
+"""
+
+import os
+
+from utilities.utils_cache import FileCache
+
+#-------------------------------------------------------------------------------
+def counting_loader():
+    """ Returns loader reading a file's text, counting its calls.
+    """
+    def load(file_path: str, upper: bool = False) -> str:
+        load.calls += 1
+        with open(file_path) as in_file:
+            text = in_file.read()
+        return text.upper() if upper else text
+    load.calls = 0
+    return load
+
+
+def touch_later(path, seconds: int = 10):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 10 ** 9))
+
+#-------------------------------------------------------------------------------
+def test_hit_until_source_changes(tmp_path):
+    source = tmp_path / 'data.txt'
+    source.write_text('abc')
+    cache = FileCache(tmp_path / 'cache')
+    loader = counting_loader()
+
+    assert cache.load(str(source), loader) == 'abc'
+    assert cache.load(str(source), loader) == 'abc'
+    assert (loader.calls, cache.hits, cache.misses) == (1, 1, 1)
+
+    # Loader arguments are part of the key
+    assert cache.load(str(source), loader, upper=True) == 'ABC'
+    assert loader.calls == 2
+
+    source.write_text('abcd')
+    assert cache.load(str(source), loader) == 'abcd'
+    assert loader.calls == 3
+
+
+def test_same_size_uses_content_hash(tmp_path):
+    source = tmp_path / 'data.txt'
+    source.write_text('abc')
+    cache = FileCache(tmp_path / 'cache')
+    loader = counting_loader()
+    cache.load(str(source), loader)
+
+    # Only the modification time changed: still valid
+    touch_later(source)
+    assert cache.load(str(source), loader) == 'abc'
+    assert loader.calls == 1
+
+    # Same size, different content: reloaded
+    source.write_text('xyz')
+    touch_later(source, 20)
+    assert cache.load(str(source), loader) == 'xyz'
+    assert loader.calls == 2
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = FileCache(tmp_path / 'cache')
+    loader = counting_loader()
+    sources = []
+    for i in range(3):
+        source = tmp_path / f'data{i}.txt'
+        source.write_text('x' * 1000)
+        sources.append(str(source))
+        cache.load(str(source), loader)
+    entries = [cache._entry_path(source, loader, {}) for source in sources]
+    entry_size = entries[0].stat().st_size
+
+    # Use the oldest entry again, then shrink the cache to two entries
+    for i, entry in enumerate(entries):
+        os.utime(entry, (i, i))
+    cache.load(sources[0], loader)
+    cache.max_bytes = 2 * entry_size
+    cache.evict()
+    assert len(list(cache.cache_dir.glob('*.cache'))) == 2
+    assert len(list(cache.cache_dir.glob('*.cache.meta'))) == 2
+
+    calls = loader.calls
+    cache.load(sources[0], loader)
+    cache.load(sources[2], loader)
+    assert loader.calls == calls
+    cache.load(sources[1], loader)
+    assert loader.calls == calls + 1
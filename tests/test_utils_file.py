@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the JSONL and CSV file helpers.
+"""
+
+import csv
+import io
+
+import pytest
+
+from utilities import utils_file
+
+#-------------------------------------------------------------------------------
+@pytest.mark.parametrize('suffix', ['', '.gz', '.bz2', '.xz'])
+def test_append_offsets_resume_reading(tmp_path, suffix):
+    path = str(tmp_path / f'records.jsonl{suffix}')
+    first = utils_file.write_jsonl_file(path, [{'a': 1}])
+    second = utils_file.write_jsonl_file(path, [{'b': 2}])
+    third = utils_file.write_jsonl_file(path, [{'c': 3}])
+    assert first < second < third
+    assert list(utils_file.iter_jsonl_file(path, offset=second)) == [{'c': 3}]
+    assert list(utils_file.iter_jsonl_file(path, offset=third)) == []
+
+#-------------------------------------------------------------------------------
+def test_read_csv_typed_parses_booleans(tmp_path):
+    path = tmp_path / 'flags.csv'
+    path.write_text('id,flag\n1,True\n2,False\n3,false\n4,1\n5,0\n')
+    table = utils_file.read_csv_typed(str(path), {'id': int, 'flag': bool})
+    assert table['flag'].tolist() == [True, False, False, True, False]
+
+
+def test_read_csv_typed_rejects_invalid_booleans(tmp_path):
+    path = tmp_path / 'flags.csv'
+    path.write_text('id,flag\n1,yes\n')
+    with pytest.raises(ValueError):
+        utils_file.read_csv_typed(str(path), {'id': int, 'flag': bool})
+
+#-------------------------------------------------------------------------------
+def test_csv_chunk_bounds_keep_quoted_newlines():
+    data = (b'id,text\n1,"one\nline"\n2,"say ""hi""\nthen\nbye"\n'
+            b'3,plain\n4,"""quoted""\n"\n5,end\n')
+    expected = list(csv.reader(io.StringIO(data.decode(), newline='')))
+    for chunk_bytes in range(1, len(data) + 1):
+        bounds = utils_file._find_csv_chunk_bounds(data, 0, chunk_bytes)
+        assert bounds[0] == 0 and bounds[-1] == len(data)
+        rows = []
+        for start, end in zip(bounds, bounds[1:]):
+            rows += csv.reader(io.StringIO(data[start:end].decode(), newline=''))
+        assert rows == expected, chunk_bytes
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the RFC3339 timestamp functions.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from utilities import utils_time
+
+#-------------------------------------------------------------------------------
+# Batch functions match the scalar ones
+@pytest.mark.parametrize('value', [datetime(2025, 2, 28, 1, 2, 3, 123456),
+                                   datetime(2025, 2, 28, 1, 2, 3, 5000),
+                                   datetime(2025, 2, 28)])
+def test_convert_datetimes_matches_scalar(value):
+    assert utils_time.convert_datetimes_to_RFC3339([value])[0] == \
+        utils_time.convert_datetime_to_RFC3339(value)
+
+
+def test_convert_datetimes_rejects_aware_and_missing():
+    with pytest.raises(ValueError):
+        utils_time.convert_datetimes_to_RFC3339([datetime(2025, 1, 1, tzinfo=timezone(timedelta(hours=5)))])
+    with pytest.raises(ValueError):
+        utils_time.convert_datetimes_to_RFC3339(np.array(['2025-01-01', 'NaT'], dtype='datetime64[s]'))
+
+
+@pytest.mark.parametrize('timestamp', ['2025-02-28T01:02:03Z', '2025-02-28T01:02:03.45Z',
+                                       '2025-02-28T01:02:03.999999Z'])
+def test_get_datetimes_matches_scalar(timestamp):
+    assert utils_time.get_datetimes_from_RFC3339([timestamp])[0] == \
+        np.datetime64(utils_time.get_datetime_from_RFC3339(timestamp))
+
+
+@pytest.mark.parametrize('timestamp', ['2025-02-28 01:02:03Z', '2025-02-28T01:02:03',
+                                       '2025-02-28T01:02Z', '2025/02/28T01:02:03Z'])
+def test_get_datetimes_rejects_what_scalar_rejects(timestamp):
+    with pytest.raises(ValueError):
+        utils_time.get_datetime_from_RFC3339(timestamp)
+    with pytest.raises(ValueError):
+        utils_time.get_datetimes_from_RFC3339([timestamp])
+
+
+def test_batch_errors_print_only_offending_value(capsys):
+    timestamps = ['2025-02-28T01:02:03Z'] * 1000 + ['bad']
+    with pytest.raises(ValueError):
+        utils_time.get_datetimes_from_RFC3339(timestamps)
+    output = capsys.readouterr().out
+    assert 'bad' in output
+    assert output.count('2025-02-28T01:02:03Z') <= 1
+
+#-------------------------------------------------------------------------------
+# Parsing with fractions and offsets
+@pytest.mark.parametrize('timestamp, expected', [
+    ('2025-02-28T01:02:03Z', datetime(2025, 2, 28, 1, 2, 3, tzinfo=timezone.utc)),
+    ('2025-02-28t01:02:03.5z', datetime(2025, 2, 28, 1, 2, 3, 500000, tzinfo=timezone.utc)),
+    ('2025-02-28T01:02:03.123456789+05:30',
+     datetime(2025, 2, 28, 1, 2, 3, 123456, tzinfo=timezone(timedelta(hours=5, minutes=30)))),
+    ('2025-02-28 01:02:03-08:00', datetime(2025, 2, 28, 1, 2, 3, tzinfo=timezone(timedelta(hours=-8)))),
+])
+def test_parse_RFC3339(timestamp, expected):
+    parsed = utils_time.parse_RFC3339(timestamp)
+    assert parsed == expected
+    assert parsed.utcoffset() == expected.utcoffset()
+
+
+@pytest.mark.parametrize('timestamp', ['2025-02-28T01:02:03', '2025-02-28T01:02:03+0530',
+                                       '2025-02-28T01:02:03.x+05:30', '2025-02-28T01:02'])
+def test_parse_RFC3339_rejects_invalid(timestamp):
+    with pytest.raises(ValueError):
+        utils_time.parse_RFC3339(timestamp)
+    with pytest.raises(ValueError):
+        utils_time.parse_RFC3339_array([timestamp])
+
+
+def test_parse_RFC3339_array_converts_to_utc():
+    parsed = utils_time.parse_RFC3339_array(['2025-02-28T01:02:03.123456789Z',
+                                             '2025-02-28T01:02:03+05:30',
+                                             '2025-02-28T23:30:00-01:00'])
+    assert parsed.dtype == np.dtype('datetime64[ns]')
+    np.testing.assert_array_equal(parsed, np.array(['2025-02-28T01:02:03.123456789',
+                                                    '2025-02-27T19:32:03',
+                                                    '2025-03-01T00:30:00'], dtype='datetime64[ns]'))
+    assert len(utils_time.parse_RFC3339_array([])) == 0
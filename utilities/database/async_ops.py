@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Module for using the SQLite and PostgreSQL database functions from asyncio.
+
+Calls run on executor threads so that the event loop is never blocked. Each
+SQLite connection is confined to its own single-thread executor, as sqlite3
+connections must stay on the thread that opened them. PostgreSQL calls run on
+a thread pool sized to match a PGConnectionPool, each call drawing its own
+pooled connection. The number of calls in flight is bounded by a semaphore.
+
+Author:     agent
+Created:    2026-10-18
+"""
+
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional, Sequence, Union
+
+import pandas as pd
+
+from utilities.database import pgsql_db_ops, sqlite_db_ops
+
+#-------------------------------------------------------------------------------
+class AsyncSQLiteConnection:
+    """ SQLite connection used from asyncio, with every call run on one
+    dedicated thread. Open with connect_sqlite_db_async.
+
+    Inputs:
+        executor: single-thread executor owning the connection
+        conn: connection opened on the executor thread
+        max_pending: maximum number of calls queued or running at once
+    """
+
+    def __init__(self,
+                 executor: ThreadPoolExecutor,
+                 conn: sqlite3.Connection,
+                 max_pending: int = 64):
+        self._executor = executor
+        self.conn = conn
+        self._semaphore = asyncio.Semaphore(max_pending)
+
+    async def _run(self, func, *args, **kwargs):
+        """ Runs func(*args, **kwargs) on the connection's thread.
+        """
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def execute(self,
+                      sql_execute_string: str,
+                      params: Union[Sequence, dict] = ()) -> None:
+        """ Executes SQL command on database, as execute_sqlite_command.
+        """
+        await self._run(sqlite_db_ops.execute_sqlite_command, self.conn, sql_execute_string, params)
+
+    async def query(self,
+                    sql_query_string: str,
+                    params: Union[Sequence, dict] = (),
+                    cache: Optional[sqlite_db_ops.QueryCache] = None) -> list:
+        """ Queries SQL table and returns data, as query_sqlite_command.
+        """
+        return await self._run(sqlite_db_ops.query_sqlite_command, self.conn, sql_query_string,
+                               params, cache)
+
+    async def upload(self,
+                     table_loc: str,
+                     table_name: str,
+                     **kwargs) -> dict:
+        """ Uploads CSV data table to database, as stream_upload_table.
+        """
+        return await self._run(sqlite_db_ops.stream_upload_table, self.conn, table_loc, table_name,
+                               **kwargs)
+
+    async def commit(self) -> None:
+        """ Commits the current transaction.
+        """
+        await self._run(self.conn.commit)
+
+    async def close(self) -> None:
+        """ Closes the connection and shuts down its thread.
+        """
+        await self._run(self.conn.close)
+        self._executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+#-------------------------------------------------------------------------------
+async def connect_sqlite_db_async(db_path: str,
+                                  pragmas: Optional[dict] = None,
+                                  cached_statements: int = 128,
+                                  max_pending: int = 64) -> AsyncSQLiteConnection:
+    """ Creates a database connection to SQLite database on a dedicated thread
+    and returns an asyncio wrapper for it.
+
+    Inputs:
+        db_path: path to database file
+        pragmas: pragmas to set on the connection, optional (see default_pragmas)
+        cached_statements: number of prepared statements cached by the connection
+        max_pending: maximum number of calls queued or running at once
+
+    Outputs:
+        conn: asyncio connection to database (return)
+    """
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite')
+
+    def connect():
+        conn = sqlite3.connect(db_path, cached_statements=cached_statements)
+        if pragmas:
+            sqlite_db_ops.apply_pragmas(conn, pragmas)
+        return conn
+
+    try:
+        conn = await asyncio.get_running_loop().run_in_executor(executor, connect)
+    except BaseException:
+        executor.shutdown(wait=False)
+        raise
+    return AsyncSQLiteConnection(executor, conn, max_pending)
+
+#-------------------------------------------------------------------------------
+class _PGPoolOps:
+    """ Blocking operations run by AsyncPGPool on worker threads, each on a 
+    connection drawn from a PGConnectionPool.
+    """
+
+    def __init__(self, pool: pgsql_db_ops.PGConnectionPool):
+        self.pool = pool
+
+    def execute(self, sql_execute_string: str, params: Optional[tuple] = None) -> None:
+        pgsql_db_ops.execute_pgsql_command(self.pool, sql_execute_string, params)
+
+    def execute_batch(self, sql_execute_string: str, params_seq, **kwargs) -> dict:
+        return pgsql_db_ops.execute_pgsql_batch(self.pool, sql_execute_string, params_seq, **kwargs)
+
+    def query(self, sql_query_string: str) -> pd.DataFrame:
+        return pgsql_db_ops.query_pgsql_table(self.pool, sql_query_string)
+
+    def upload(self, source, table_name: str, **kwargs) -> dict:
+        return pgsql_db_ops.copy_upload_table(self.pool, source, table_name, **kwargs)
+
+    def closeall(self) -> None:
+        self.pool.closeall()
+
+#-------------------------------------------------------------------------------
+class AsyncPGPool:
+    """ PostgreSQL connection pool used from asyncio. Each call runs on a
+    worker thread with its own connection from the pool, with at most
+    max_concurrency calls in flight.
+
+    :Parameters:
+        pool: PGConnectionPool
+            pool to draw connections from
+        max_concurrency: int
+            maximum number of calls in flight, at most the pool's maxconn
+    """
+
+    def __init__(self,
+                 pool: pgsql_db_ops.PGConnectionPool,
+                 max_concurrency: int = 10):
+        self.pool = pool
+        self._ops = _PGPoolOps(pool)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='pgsql')
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _run(self, func, *args, **kwargs):
+        """ Runs func(*args, **kwargs) on a worker thread.
+        """
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def execute(self,
+                      sql_execute_string: str,
+                      params: Optional[tuple] = None) -> None:
+        """ Executes SQL command on database and commits, as execute_pgsql_command.
+        """
+        await self._run(self._ops.execute, sql_execute_string, params)
+
+    async def execute_batch(self,
+                            sql_execute_string: str,
+                            params_seq,
+                            **kwargs) -> dict:
+        """ Executes SQL command for many parameter tuples, as execute_pgsql_batch.
+        """
+        return await self._run(self._ops.execute_batch, sql_execute_string, params_seq, **kwargs)
+
+    async def query(self, sql_query_string: str) -> pd.DataFrame:
+        """ Queries SQL table and returns data, as query_pgsql_table.
+        """
+        return await self._run(self._ops.query, sql_query_string)
+
+    async def upload(self, source, table_name: str, **kwargs) -> dict:
+        """ Uploads table to database with COPY, as copy_upload_table.
+        """
+        return await self._run(self._ops.upload, source, table_name, **kwargs)
+
+    async def close(self) -> None:
+        """ Shuts down the worker threads and closes all pooled connections.
+        """
+        self._executor.shutdown(wait=False)
+        await asyncio.get_running_loop().run_in_executor(None, self._ops.closeall)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+#-------------------------------------------------------------------------------
+async def open_pg_pool_async(user: str,
+                             password: str,
+                             dbname: str,
+                             host: str = 'localhost',
+                             port: str = '5432',
+                             max_concurrency: int = 10,
+                             **kwargs) -> AsyncPGPool:
+    """ Creates a pool of connections to PostgreSQL database without blocking
+    the event loop and returns an asyncio wrapper for it.
+
+    :Parameters:
+        user: str
+            username for database
+        password: str
+            password for database
+        dbname: str
+            name of database
+        host: str
+            host address for database
+        port: str
+            port number for database
+        max_concurrency: int
+            maximum number of calls in flight, also the pool's maxconn
+        kwargs:
+            further arguments for PGConnectionPool (e.g. minconn, health_check)
+
+    :Returns:
+        pool: AsyncPGPool
+            asyncio pool of connections to database
+    """
+    pool = await asyncio.get_running_loop().run_in_executor(
+        None, partial(pgsql_db_ops.PGConnectionPool, user, password, dbname, host, port,
+                      maxconn=max_concurrency, **kwargs))
+    return AsyncPGPool(pool, max_concurrency)
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Module for timing statements run through the database modules.
+
+Records per-statement latency, rows returned or affected, errors and time
+spent waiting for connections, with a log of slow statements. Statements are
+grouped with their literals replaced by '?', and at most max_statements
+distinct statements are tracked, the rest being counted together. Recording is
+off until enable() is called; while disabled, timed() hands out a shared
+no-op timer so instrumented calls cost only a flag check.
+
+Author:     agent
+Created:    2026-10-18
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_right
+from collections import deque
+from datetime import datetime, timezone
+
+from utilities import utils_file, utils_time
+
+# Upper bounds in seconds of the latency histogram buckets
+histogram_bounds = (0.0001, 0.001, 0.01, 0.1, 1.0, 10.0, float('inf'))
+
+enabled = False
+slow_query_seconds = 1.0
+window_size = 1000
+max_statements = 1000
+
+# Key under which statements beyond max_statements are recorded
+other_statements = '(other statements)'
+
+# String and numeric literals, and the lists of placeholders left once they
+# are replaced, e.g. in IN (1, 2, 3)
+_literals = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_placeholder_lists = re.compile(r'\?(?:\s*,\s*\?)+')
+
+_lock = threading.Lock()
+_statements = {}
+_waits = {}
+_slow_queries = deque(maxlen=100)
+
+#-------------------------------------------------------------------------------
+def enable(slow_seconds: float = 1.0,
+           slow_log_size: int = 100,
+           window: int = 1000,
+           statements: int = 1000) -> None:
+    """ Starts recording statement timings.
+
+    :Parameters:
+        slow_seconds: float
+            statements taking at least this long are added to the slow query log
+        slow_log_size: int
+            number of most recent slow statements kept
+        window: int
+            number of most recent timings per statement used for percentiles
+            and histograms
+        statements: int
+            maximum number of distinct statements tracked
+    """
+    global enabled, slow_query_seconds, window_size, max_statements, _slow_queries
+    with _lock:
+        slow_query_seconds = slow_seconds
+        window_size = window
+        max_statements = statements
+        _slow_queries = deque(_slow_queries, maxlen=slow_log_size)
+        for stats in _statements.values():
+            stats['recent'] = deque(stats['recent'], maxlen=window)
+        enabled = True
+
+#-------------------------------------------------------------------------------
+def disable() -> None:
+    """ Stops recording statement timings. Recorded statistics are kept.
+    """
+    global enabled
+    enabled = False
+
+#-------------------------------------------------------------------------------
+def reset() -> None:
+    """ Clears all recorded statistics.
+    """
+    with _lock:
+        _statements.clear()
+        _waits.clear()
+        _slow_queries.clear()
+
+#-------------------------------------------------------------------------------
+def _statement_key(statement) -> str:
+    """ Returns statement text with whitespace collapsed and literals replaced
+    by '?', truncated for use as a key.
+    """
+    text = _literals.sub('?', ' '.join(str(statement).split()))
+    return _placeholder_lists.sub('?, ...', text)[:200]
+
+#-------------------------------------------------------------------------------
+def record(database: str,
+           statement,
+           seconds: float,
+           rows: int = -1,
+           error: bool = False) -> None:
+    """ Records one execution of a statement.
+
+    :Parameters:
+        database: str
+            kind of database, e.g. 'sqlite' or 'pgsql'
+        statement: str
+            SQL statement or operation name
+        seconds: float
+            time taken
+        rows: int
+            rows returned or affected, -1 if unknown
+        error: bool
+            whether the statement raised an error
+    """
+    key = (database, _statement_key(statement))
+    with _lock:
+        stats = _statements.get(key)
+        if stats is None and len(_statements) >= max_statements:
+            key = (database, other_statements)
+            stats = _statements.get(key)
+        if stats is None:
+            stats = _statements[key] = {'count': 0, 'errors': 0, 'total_seconds': 0.0,
+                                        'max_seconds': 0.0, 'rows': 0,
+                                        'recent': deque(maxlen=window_size)}
+        stats['count'] += 1
+        stats['errors'] += error
+        stats['total_seconds'] += seconds
+        stats['max_seconds'] = max(stats['max_seconds'], seconds)
+        if rows > 0:
+            stats['rows'] += rows
+        stats['recent'].append(seconds)
+        if seconds >= slow_query_seconds:
+            _slow_queries.append({'time': utils_time.format_RFC3339(datetime.now(timezone.utc), 3),
+                                  'database': database, 'statement': key[1],
+                                  'seconds': seconds, 'rows': rows, 'error': error})
+
+#-------------------------------------------------------------------------------
+def record_wait(database: str, seconds: float) -> None:
+    """ Records time spent waiting for a connection or lock.
+
+    :Parameters:
+        database: str
+            kind of database, e.g. 'sqlite' or 'pgsql'
+        seconds: float
+            time waited
+    """
+    with _lock:
+        stats = _waits.setdefault(database, {'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+        stats['count'] += 1
+        stats['total_seconds'] += seconds
+        stats['max_seconds'] = max(stats['max_seconds'], seconds)
+
+#-------------------------------------------------------------------------------
+class _Timer:
+    """ Context manager recording the time taken by its block. Set rows within
+    the block to record rows returned or affected.
+    """
+    __slots__ = ('database', 'statement', 'rows', 'start')
+
+    def __init__(self, database: str, statement):
+        self.database = database
+        self.statement = statement
+        self.rows = -1
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        record(self.database, self.statement, time.perf_counter() - self.start,
+               self.rows, exc_type is not None)
+
+
+class _NullTimer:
+    """ Context manager that records nothing, used while disabled.
+    """
+    __slots__ = ('rows',)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+_null_timer = _NullTimer()
+
+#-------------------------------------------------------------------------------
+def timed(database: str, statement):
+    """ Returns context manager timing a statement run within its block, or a
+    no-op one while disabled.
+
+    :Parameters:
+        database: str
+            kind of database, e.g. 'sqlite' or 'pgsql'
+        statement: str
+            SQL statement or operation name
+
+    :Returns:
+        timer: context manager
+            timer whose rows attribute can be set within the block
+    """
+    if not enabled:
+        return _null_timer
+    return _Timer(database, statement)
+
+#-------------------------------------------------------------------------------
+def get_stats() -> dict:
+    """ Returns recorded statistics: per-statement counts and latency totals,
+    with percentiles and histograms over the recent window, sorted by total time;
+    connection waits per database; and the slow query log.
+
+    :Returns:
+        stats: dict
+            recorded statistics
+    """
+    with _lock:
+        statements = []
+        for (database, statement), stats in _statements.items():
+            recent = sorted(stats['recent'])
+            # Timings up to each bucket bound, less those in lower buckets
+            cumulative = [bisect_right(recent, bound) for bound in histogram_bounds]
+            statements.append({
+                'database': database,
+                'statement': statement,
+                'count': stats['count'],
+                'errors': stats['errors'],
+                'rows': stats['rows'],
+                'total_seconds': stats['total_seconds'],
+                'mean_seconds': stats['total_seconds'] / stats['count'],
+                'max_seconds': stats['max_seconds'],
+                'p50_seconds': recent[len(recent) // 2],
+                'p95_seconds': recent[min(len(recent) - 1, int(len(recent) * 0.95))],
+                'histogram': {f'le_{bound}': count - below for bound, count, below
+                              in zip(histogram_bounds, cumulative, [0] + cumulative[:-1])},
+            })
+        statements.sort(key=lambda stats: stats['total_seconds'], reverse=True)
+        return {'enabled': enabled,
+                'statements': statements,
+                'connection_waits': {database: dict(stats) for database, stats in _waits.items()},
+                'slow_queries': list(_slow_queries)}
+
+#-------------------------------------------------------------------------------
+def dump_json(out_file_w_path: str) -> None:
+    """ Writes recorded statistics to a JSON file.
+
+    :Parameters:
+        out_file_w_path: str
+            path to write statistics to
+    """
+    utils_file.write_json_file(out_file_w_path, get_stats())
@@ -6,33 +6,186 @@ Author:     Kushal Moolchandani
 Created:    2025-02-06
 """
 
+import numpy as np
+import os
 import pandas
 import sqlite3
 import sys
-from typing import Optional
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import chain, islice
+from typing import Iterator, Optional, Sequence, Union
+
+from utilities import utils_file
+from utilities.database import instrumentation
+
+# Pragmas applied to connections from SQLiteConnectionManager unless overridden:
+# write-ahead log so readers run alongside a writer, fewer fsyncs, a 64 MB page
+# cache and 256 MB of memory-mapped I/O
+default_pragmas = {'journal_mode': 'WAL',
+                   'synchronous': 'NORMAL',
+                   'cache_size': -64000,
+                   'mmap_size': 268435456,
+                   'temp_store': 'MEMORY'}
 
 #-------------------------------------------------------------------------------
 def connect_sqlite_db(db_file: str, 
-                      db_loc: str) -> Optional[sqlite3.Connection]:
+                      db_loc: str,
+                      pragmas: Optional[dict] = None,
+                      cached_statements: int = 128) -> Optional[sqlite3.Connection]:
     """ Creates a database connection to SQLite database and returns a 
     connection object.
     
     Inputs:
         db_loc: path to database
         db_file: name of database file
+        pragmas: pragmas to set on the connection, optional (see default_pragmas)
+        cached_statements: number of prepared statements cached by the connection
     
     Outputs:
         conn: connection to database (return)
     """
     conn = None
     try:
-        conn = sqlite3.connect(''.join([db_loc,'/',db_file]))
+        conn = sqlite3.connect(''.join([db_loc,'/',db_file]), 
+                               cached_statements=cached_statements)
+        if pragmas:
+            apply_pragmas(conn, pragmas)
         print(f'Connection open to {db_file}.')
     except sqlite3.Error as e:
         print(e)
     
     return conn
 
+#-------------------------------------------------------------------------------
+def apply_pragmas(conn: sqlite3.Connection, 
+                  pragmas: dict) -> None:
+    """ Sets pragmas (e.g. journal_mode, synchronous, cache_size, mmap_size)
+    on a connection.
+
+    Inputs:
+        conn: connection to the database
+        pragmas: dict of pragma name to value
+    """
+    for name, value in pragmas.items():
+        conn.execute(f'PRAGMA {name} = {value}')
+
+#-------------------------------------------------------------------------------
+class SQLiteConnectionManager:
+    """ Provides one reusable connection per thread to an SQLite database, 
+    with pragmas applied once when each connection is opened. 
+
+    Writes go through transaction(), which takes the write lock up front 
+    (BEGIN IMMEDIATE). With the default WAL journal, managers opened with 
+    read_only=True can read concurrently with a single writer.
+
+    Inputs:
+        db_path: path to database file
+        pragmas: pragmas to set, merged over default_pragmas
+        read_only: open connections in read-only mode
+        timeout: seconds to wait for a lock held by another connection
+        cached_statements: number of prepared statements cached per connection
+    """
+
+    def __init__(self, 
+                 db_path: str, 
+                 pragmas: Optional[dict] = None, 
+                 read_only: bool = False, 
+                 timeout: float = 30.0,
+                 cached_statements: int = 128):
+        self.db_path = db_path
+        self.pragmas = {**default_pragmas, **(pragmas or {})}
+        self.read_only = read_only
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def connection(self) -> sqlite3.Connection:
+        """ Returns the connection for the calling thread, opening it on first
+        use.
+
+        Outputs:
+            conn: connection to database (return)
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if self.read_only:
+                conn = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True,
+                                       timeout=self.timeout, isolation_level=None,
+                                       check_same_thread=False,
+                                       cached_statements=self.cached_statements)
+                # Journal mode is a property of the database file, set by writers
+                apply_pragmas(conn, {name: value for name, value in self.pragmas.items()
+                                     if name != 'journal_mode'})
+                conn.execute('PRAGMA query_only = ON')
+            else:
+                conn = sqlite3.connect(self.db_path, timeout=self.timeout,
+                                       isolation_level=None, check_same_thread=False,
+                                       cached_statements=self.cached_statements)
+                apply_pragmas(conn, self.pragmas)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self, mode: str = 'IMMEDIATE'):
+        """ Context manager running a transaction on the calling thread's
+        connection, committed on exit or rolled back on error.
+
+        Inputs:
+            mode: DEFERRED, IMMEDIATE or EXCLUSIVE
+        
+        Outputs:
+            conn: connection to database, within the transaction (yield)
+        """
+        conn = self.connection()
+        if self.read_only:
+            mode = 'DEFERRED'
+        if instrumentation.enabled:
+            # Time spent waiting for the write lock
+            wait_start = time.perf_counter()
+            conn.execute(f'BEGIN {mode}')
+            instrumentation.record_wait('sqlite', time.perf_counter() - wait_start)
+        else:
+            conn.execute(f'BEGIN {mode}')
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+
+    def close(self) -> None:
+        """ Closes the calling thread's connection, if open.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.conn = None
+            with self._lock:
+                self._connections.remove(conn)
+            conn.close()
+
+    def close_all(self) -> None:
+        """ Closes the connections of all threads.
+        """
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close_all()
+
 #-------------------------------------------------------------------------------
 def disconnect_sqlite_db(conn: sqlite3.Connection) -> None:
     """ Closes connection to SQLite database specified by connection object.
@@ -45,44 +198,232 @@ def disconnect_sqlite_db(conn: sqlite3.Connection) -> None:
 
 #-------------------------------------------------------------------------------
 def execute_sqlite_command(conn: sqlite3.Connection, 
-                           sql_execute_string: str) -> None:
+                           sql_execute_string: str,
+                           params: Union[Sequence, dict] = ()) -> None:
     """ Executes SQL command passed as string argument on database. Needs 
     connection to database as an argument. Use this function to make changes 
     to database, with no return statement.
     
     Inputs:
         conn: connection to the database
-        sql_execute_string: SQL command
+        sql_execute_string: SQL command, with ? or :name placeholders for params
+        params: values bound to the placeholders, optional
     """
     try:
-        c = conn.cursor()
-        c.execute(sql_execute_string)
+        with instrumentation.timed('sqlite', sql_execute_string) as timer:
+            c = conn.cursor()
+            c.execute(sql_execute_string, params)
+            timer.rows = c.rowcount
     except sqlite3.Error as e:
         print(e)
 
 #-------------------------------------------------------------------------------
 def query_sqlite_command(conn: sqlite3.Connection, 
-                         sql_query_string: str):
+                         sql_query_string: str,
+                         params: Union[Sequence, dict] = (),
+                         cache: Optional['QueryCache'] = None):
     """ Queries SQL table as per the passed command and returns data. Needs 
     connection to database as an argument. 
     
     Inputs:
         conn: connection to the database
-        sql_query_string: SQL command
+        sql_query_string: SQL command, with ? or :name placeholders for params
+        params: values bound to the placeholders, optional
+        cache: result cache to serve repeated queries from, optional
     
     Outputs:
         result: data returned from database
     """
     try:
-        c = conn.cursor()
-        c.execute(sql_query_string)
+        if cache is not None:
+            return cache.query(conn, sql_query_string, params)
+        with instrumentation.timed('sqlite', sql_query_string) as timer:
+            c = conn.cursor()
+            c.execute(sql_query_string, params)
 
-        rows = c.fetchall()
+            rows = c.fetchall()
+            timer.rows = len(rows)
     except sqlite3.Error as e:
         print(e)
     
     return rows
 
+#-------------------------------------------------------------------------------
+def iter_query_sqlite(conn: sqlite3.Connection, 
+                      sql_query_string: str,
+                      params: Union[Sequence, dict] = (),
+                      batch_size: int = 10000,
+                      output: str = 'rows') -> Iterator:
+    """ Queries SQL table as per the passed command and streams the result in 
+    batches fetched with fetchmany, so large results are never held in memory 
+    at once. Values are bound to placeholders rather than interpolated, so the 
+    prepared statement is reused from the connection's statement cache.
+    
+    Inputs:
+        conn: connection to the database
+        sql_query_string: SQL command, with ? or :name placeholders for params
+        params: values bound to the placeholders, optional
+        batch_size: number of rows per batch
+        output: format of each batch, 'rows' (list of tuples), 'columns' 
+            (dict of column name to NumPy array) or 'dataframe' (pandas DataFrame)
+    
+    Outputs:
+        batches: generator of result batches (yield)
+    """
+    if output not in ('rows', 'columns', 'dataframe'):
+        raise ValueError(f"Unknown output '{output}'.")
+    c = conn.cursor()
+    # Time spent in the database, excluding the consumer's processing of batches
+    timing = instrumentation.enabled
+    seconds = 0.0
+    count = 0
+    error = False
+    try:
+        start = time.perf_counter() if timing else 0.0
+        c.execute(sql_query_string, params)
+        names = [column[0] for column in c.description or ()]
+        while rows := c.fetchmany(batch_size):
+            if timing:
+                seconds += time.perf_counter() - start
+                count += len(rows)
+            if output == 'rows':
+                yield rows
+            elif output == 'columns':
+                yield {name: np.array(values) for name, values in zip(names, zip(*rows))}
+            else:
+                yield pandas.DataFrame.from_records(rows, columns=names)
+            if timing:
+                start = time.perf_counter()
+        if timing:
+            seconds += time.perf_counter() - start
+    except Exception:
+        error = True
+        raise
+    finally:
+        c.close()
+        if timing:
+            instrumentation.record('sqlite', sql_query_string, seconds, count, error)
+
+#-------------------------------------------------------------------------------
+class QueryCache:
+    """ Least recently used cache of query results, for read queries repeated 
+    against data that rarely changes. 
+
+    Results are keyed on database file, SQL and parameters, so connections to 
+    the same file (e.g. the per-thread connections of SQLiteConnectionManager) 
+    share them. Each is stored with the database's change version, the size 
+    and modification time of the database and WAL files, and is discarded 
+    when the version no longer matches. Queries on in-memory or temporary 
+    databases, or run inside an open transaction, bypass the cache. Hits 
+    return a copy of the cached rows. Entries are evicted once their 
+    estimated total size exceeds max_bytes.
+
+    Inputs:
+        max_bytes: maximum estimated size of cached results
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _version(db_file: str) -> tuple:
+        """ Returns the current change version of a database file.
+        """
+        version = ()
+        for path in (db_file, db_file + '-wal'):
+            try:
+                stat = os.stat(path)
+                version += (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                version += (None, None)
+        return version
+
+    @staticmethod
+    def _estimate_size(rows: list) -> int:
+        """ Returns an estimate of the memory held by a list of result rows.
+        """
+        size = sys.getsizeof(rows)
+        for row in rows:
+            size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+        return size
+
+    def query(self, 
+              conn: sqlite3.Connection, 
+              sql_query_string: str,
+              params: Union[Sequence, dict] = ()) -> list:
+        """ Queries SQL table as per the passed command, returning the cached 
+        result if the database has not changed since it was stored.
+
+        Inputs:
+            conn: connection to the database
+            sql_query_string: SQL command, with ? or :name placeholders for params
+            params: values bound to the placeholders, optional
+
+        Outputs:
+            rows: data returned from database or cache (return)
+        """
+        db_file = conn.execute('PRAGMA database_list').fetchone()[2]
+        if not db_file or conn.in_transaction:
+            with instrumentation.timed('sqlite', sql_query_string) as timer:
+                rows = conn.execute(sql_query_string, params).fetchall()
+                timer.rows = len(rows)
+            return rows
+
+        key = (db_file, sql_query_string,
+               tuple(sorted(params.items())) if isinstance(params, dict) else tuple(params))
+        version = self._version(db_file)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == version:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return list(entry[1])
+                del self._entries[key]
+                self.size -= entry[2]
+                self.invalidations += 1
+            self.misses += 1
+
+        with instrumentation.timed('sqlite', sql_query_string) as timer:
+            rows = conn.execute(sql_query_string, params).fetchall()
+            timer.rows = len(rows)
+        size = self._estimate_size(rows)
+        if size <= self.max_bytes:
+            with self._lock:
+                old = self._entries.pop(key, None)
+                if old is not None:
+                    self.size -= old[2]
+                self._entries[key] = (version, tuple(rows), size)
+                self.size += size
+                while self.size > self.max_bytes:
+                    _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                    self.size -= evicted_size
+                    self.evictions += 1
+        return rows
+
+    def clear(self) -> None:
+        """ Removes all cached results.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        """ Returns hit, miss, eviction and invalidation counts with the number 
+        and estimated size of cached results.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 
+                    'evictions': self.evictions, 'invalidations': self.invalidations,
+                    'entries': len(self._entries), 'bytes': self.size}
+
 #-------------------------------------------------------------------------------
 def upload_table(conn: sqlite3.Connection, 
                  table_loc: str, 
@@ -98,9 +439,142 @@ def upload_table(conn: sqlite3.Connection,
 
     c = conn.cursor()
     data = pandas.read_csv(table_loc)
-    data.to_sql(table_name, conn, if_exists='replace',
-                    index = False, chunksize = 10000)
+    with instrumentation.timed('sqlite', f'upload_table {table_name}') as timer:
+        data.to_sql(table_name, conn, if_exists='replace',
+                        index = False, chunksize = 10000)
+        timer.rows = len(data)
+    
+#-------------------------------------------------------------------------------
+def infer_sqlite_type(values) -> str:
+    """ Infers SQLite column type (INTEGER, REAL or TEXT) from sample string
+    values, ignoring empty values.
+
+    Inputs:
+        values: sample of string values from a column
     
+    Outputs:
+        column_type: SQLite type name (return)
+    """
+    column_type = 'INTEGER'
+    for value in values:
+        if value == '':
+            continue
+        if column_type == 'INTEGER':
+            try:
+                int(value)
+                continue
+            except ValueError:
+                column_type = 'REAL'
+        try:
+            float(value)
+        except ValueError:
+            return 'TEXT'
+    return column_type
+
+#-------------------------------------------------------------------------------
+def stream_upload_table(conn: sqlite3.Connection, 
+                        table_loc: str, 
+                        table_name: str,
+                        schema: Optional[dict] = None,
+                        if_exists: str = 'replace',
+                        batch_size: int = 50000,
+                        transaction_rows: int = 1000000,
+                        indexes: Optional[dict] = None,
+                        defer_indexes: bool = True,
+                        infer_rows: int = 1000,
+                        delimiter: str = ',') -> dict:
+    """
+    Uploads data table to specified database by streaming the CSV file, 
+    without loading it into memory. Rows are inserted with executemany in 
+    batches, inside explicit transactions of transaction_rows rows, so it 
+    cannot be called with a transaction already open. Empty values are stored 
+    as NULL and blank lines are skipped.
+
+    Inputs:
+        conn: connection to a database
+        table_loc: full path to data table (CSV with a header row)
+        table_name: name of table in the database
+        schema: dict of column name to SQLite type, inferred from the first 
+            infer_rows rows if not given
+        if_exists: 'replace', 'append' or 'fail' if the table already exists
+        batch_size: number of rows per executemany call
+        transaction_rows: number of rows per transaction
+        indexes: dict of index name to list of columns, created after the load
+        defer_indexes: drop existing indexes on the table during the load and 
+            recreate them afterwards
+        infer_rows: number of rows sampled to infer the schema
+        delimiter: delimiter used in the CSV file
+
+    Outputs:
+        stats: dict with rows loaded, seconds elapsed and rows per second (return)
+    """
+    if if_exists not in ('replace', 'append', 'fail'):
+        raise ValueError(f"Unknown if_exists '{if_exists}'.")
+    if conn.in_transaction:
+        raise ValueError('stream_upload_table commits as it loads and cannot run inside an '
+                         'open transaction; commit or roll back first.')
+    start = time.perf_counter()
+    # Blank lines come through csv as empty rows
+    rows = (row for row in utils_file.iter_csv_file(table_loc, delimiter=delimiter) if row)
+    header = next(rows, None)
+    if header is None:
+        raise ValueError(f"No header row in '{table_loc}'.")
+    sample = list(islice(rows, infer_rows))
+    if schema is None:
+        columns = list(zip(*sample)) or [()] * len(header)
+        schema = {name: infer_sqlite_type(values) for name, values in zip(header, columns)}
+
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                          (table_name,)).fetchone() is not None
+    if exists and if_exists == 'fail':
+        raise ValueError(f"Table '{table_name}' already exists.")
+    if exists and if_exists == 'replace':
+        conn.execute(f'DROP TABLE "{table_name}"')
+    columns_sql = ', '.join(f'"{name}" {schema.get(name, "TEXT")}' for name in header)
+    conn.execute(f'CREATE TABLE IF NOT EXISTS "{table_name}" ({columns_sql})')
+
+    deferred = []
+    if defer_indexes:
+        deferred = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' "
+                                "AND tbl_name = ? AND sql IS NOT NULL", (table_name,)).fetchall()
+        for name, _ in deferred:
+            conn.execute(f'DROP INDEX "{name}"')
+    conn.commit()
+
+    quoted_columns = ', '.join(f'"{name}"' for name in header)
+    insert_sql = (f'INSERT INTO "{table_name}" ({quoted_columns}) '
+                  f'VALUES ({", ".join("?" * len(header))})')
+    count = 0
+    uncommitted = 0
+    rows = chain(sample, rows)
+    with instrumentation.timed('sqlite', f'stream_upload_table {table_name}') as timer:
+        try:
+            while batch := [tuple(value if value != '' else None for value in row)
+                            for row in islice(rows, batch_size)]:
+                if not conn.in_transaction:
+                    conn.execute('BEGIN')
+                conn.executemany(insert_sql, batch)
+                count += len(batch)
+                uncommitted += len(batch)
+                timer.rows = count
+                if uncommitted >= transaction_rows:
+                    conn.commit()
+                    uncommitted = 0
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            for _, index_sql in deferred:
+                conn.execute(index_sql)
+            for name, index_columns in (indexes or {}).items():
+                index_sql = ', '.join(f'"{column}"' for column in index_columns)
+                conn.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table_name}" ({index_sql})')
+            conn.commit()
+
+    seconds = time.perf_counter() - start
+    return {'rows': count, 'seconds': seconds, 'rows_per_second': count / seconds if seconds else 0.0}
+
 #===============================================================================
 if __name__ == '__main__':
     try:
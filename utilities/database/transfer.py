@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+"""
+Module for streaming tables between SQLite and PostgreSQL databases.
+
+Author:     agent
+Created:    2026-10-18
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from utilities import utils_file
+from utilities.database import pgsql_db_ops, sqlite_db_ops
+
+#-------------------------------------------------------------------------------
+def sqlite_to_pgsql_type(declared_type: str) -> str:
+    """ Maps a declared SQLite column type to a PostgreSQL type, following
+    SQLite's type affinity rules.
+
+    :Parameters:
+        declared_type: str
+            column type as declared in SQLite
+
+    :Returns:
+        column_type: str
+            PostgreSQL type name
+    """
+    declared_type = declared_type.upper()
+    if 'INT' in declared_type:
+        return 'BIGINT'
+    if 'BOOL' in declared_type:
+        return 'BOOLEAN'
+    if any(name in declared_type for name in ('CHAR', 'CLOB', 'TEXT')) or not declared_type:
+        return 'TEXT'
+    if 'BLOB' in declared_type:
+        return 'BYTEA'
+    if any(name in declared_type for name in ('REAL', 'FLOA', 'DOUB')):
+        return 'DOUBLE PRECISION'
+    if 'TIMESTAMP' in declared_type or 'DATETIME' in declared_type:
+        return 'TIMESTAMP'
+    if 'DATE' in declared_type:
+        return 'DATE'
+    return 'NUMERIC'
+
+#-------------------------------------------------------------------------------
+def pgsql_to_sqlite_type(data_type: str) -> str:
+    """ Maps a PostgreSQL column type (as in information_schema.columns) to a
+    SQLite type.
+
+    :Parameters:
+        data_type: str
+            PostgreSQL type name
+
+    :Returns:
+        column_type: str
+            SQLite type name
+    """
+    data_type = data_type.lower()
+    if data_type in ('smallint', 'integer', 'bigint', 'boolean'):
+        return 'INTEGER'
+    if data_type in ('real', 'double precision', 'numeric'):
+        return 'REAL'
+    if data_type == 'bytea':
+        return 'BLOB'
+    return 'TEXT'
+
+#-------------------------------------------------------------------------------
+def _to_sqlite_value(data_type: str) -> Optional[Callable]:
+    """ Returns converter for values of a PostgreSQL type that sqlite3 cannot
+    bind as they come from psycopg2, or None if none is needed.
+    """
+    data_type = data_type.lower()
+    if data_type == 'numeric':
+        return float
+    if data_type.startswith(('timestamp', 'date', 'time', 'interval')) or data_type == 'uuid':
+        return str
+    if data_type in ('json', 'jsonb', 'array', 'user-defined'):
+        return json.dumps
+    return None
+
+#-------------------------------------------------------------------------------
+def _to_pgsql_value(data_type: str) -> Optional[Callable]:
+    """ Returns converter for values of a PostgreSQL type that COPY cannot read
+    as written by csv from SQLite values, or None if none is needed.
+    """
+    if data_type == 'BYTEA':
+        return lambda value: '\\x' + bytes(value).hex()
+    return None
+
+#-------------------------------------------------------------------------------
+def _pgsql_array_literal(values: list) -> str:
+    """ Returns PostgreSQL array literal for a (possibly nested) list, as 
+    psycopg2 returns array columns.
+    """
+    items = []
+    for value in values:
+        if value is None:
+            items.append('NULL')
+        elif isinstance(value, list):
+            items.append(_pgsql_array_literal(value))
+        else:
+            text = json.dumps(value) if isinstance(value, dict) else str(value)
+            items.append('"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"')
+    return '{' + ','.join(items) + '}'
+
+#-------------------------------------------------------------------------------
+def _copy_pgsql_value(data_type: str) -> Optional[Callable]:
+    """ Returns converter for values of a PostgreSQL type, as they come from 
+    psycopg2, that COPY cannot read as written by csv, or None if none is 
+    needed. Used when copying between PostgreSQL databases.
+    """
+    data_type = data_type.lower()
+    if data_type in ('json', 'jsonb'):
+        return json.dumps
+    if data_type == 'array':
+        return _pgsql_array_literal
+    if data_type == 'bytea':
+        return lambda value: '\\x' + bytes(value).hex()
+    return None
+
+#-------------------------------------------------------------------------------
+def _checkpoint_key(value):
+    """ Returns key value in a form that can be saved in a JSON checkpoint and
+    bound again as a query parameter. Dates, times, decimals and UUIDs are 
+    saved as text, which PostgreSQL casts back to the column's type.
+    """
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    return str(value)
+
+# Key column types whose values _checkpoint_key saves faithfully
+_checkpoint_pgsql_types = ('smallint', 'integer', 'bigint', 'numeric', 'real', 'double precision',
+                           'text', 'character varying', 'character', 'date', 'uuid')
+
+#-------------------------------------------------------------------------------
+def _write_checkpoint(checkpoint_file: str, checkpoint: dict):
+    """ Writes checkpoint through a temporary file, replacing the previous one
+    only once it is complete.
+    """
+    compression = utils_file.get_compression(checkpoint_file) or ''
+    tmp_file = f'{checkpoint_file}.{os.getpid()}.tmp{compression}'
+    with utils_file.open_file_at_path(tmp_file, 'w') as out_file:
+        json.dump(checkpoint, out_file, indent=4)
+    os.replace(tmp_file, checkpoint_file)
+
+#-------------------------------------------------------------------------------
+def _converter(converters: list) -> Optional[Callable]:
+    """ Returns function converting the values of a row with per-column
+    converters, or None if no column needs converting.
+    """
+    if not any(converters):
+        return None
+    indexed = [(i, convert) for i, convert in enumerate(converters) if convert]
+
+    def convert_row(row):
+        row = list(row)
+        for i, convert in indexed:
+            if row[i] is not None:
+                row[i] = convert(row[i])
+        return row
+    return convert_row
+
+#-------------------------------------------------------------------------------
+def _run_pipeline(chunks: Iterator,
+                  write: Callable,
+                  queue_size: int,
+                  read_in_thread: bool) -> None:
+    """ Runs reading and writing of chunks concurrently, one on a worker
+    thread and the other on the calling thread, through a queue of at most
+    queue_size chunks. The first error on either side stops both and is
+    raised.
+    """
+    chunk_queue = queue.Queue(maxsize=queue_size)
+    done = object()
+    stop = threading.Event()
+    errors = []
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                chunk_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for chunk in chunks:
+                if not put(chunk):
+                    break
+        except BaseException as error:
+            errors.append(error)
+            stop.set()
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+            put(done)
+
+    def consume():
+        try:
+            while not stop.is_set():
+                try:
+                    chunk = chunk_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if chunk is done:
+                    break
+                write(chunk)
+        except BaseException as error:
+            errors.append(error)
+            stop.set()
+
+    worker = threading.Thread(target=produce if read_in_thread else consume, daemon=True)
+    worker.start()
+    (consume if read_in_thread else produce)()
+    worker.join()
+    if errors:
+        raise errors[0]
+
+#-------------------------------------------------------------------------------
+def transfer_table(source_conn,
+                   dest_conn,
+                   table_name: str,
+                   dest_table: Optional[str] = None,
+                   order_by: Optional[str] = None,
+                   chunk_rows: int = 50000,
+                   queue_size: int = 4,
+                   mode: str = 'replace',
+                   checkpoint_path: Optional[str] = None) -> dict:
+    """
+    Streams a table from a SQLite database to PostgreSQL, or from PostgreSQL
+    to SQLite, in chunks of rows. Reading and writing run concurrently, with
+    at most queue_size chunks in flight. Rows are written to PostgreSQL with
+    COPY and to SQLite with executemany, each chunk in its own transaction.
+    Column types are mapped between the two databases. Tables can also be
+    copied between two databases of the same kind.
+
+    With checkpoint_path, the last order_by key written is saved after each
+    chunk, and a rerun with the same checkpoint resumes after it. The
+    checkpoint is removed once the transfer completes. Tables are looked up in
+    PostgreSQL's current schema.
+
+    :Parameters:
+        source_conn: sqlite3.Connection, psycopg2.Connection or PGConnectionPool
+            connection to the source database
+        dest_conn: sqlite3.Connection, psycopg2.Connection or PGConnectionPool
+            connection to the destination database
+        table_name: str
+            name of table in the source database
+        dest_table: str
+            name of table in the destination database, table_name if not given
+        order_by: str
+            column giving a unique, increasing key to read rows in order;
+            defaults to rowid for SQLite and is required for checkpoints from
+            PostgreSQL
+        chunk_rows: int
+            number of rows per chunk
+        queue_size: int
+            maximum number of chunks read ahead of the writer
+        mode: str
+            'replace' to drop and recreate the destination table, or 'append'
+        checkpoint_path: str
+            path of JSON checkpoint file, optional
+
+    :Returns:
+        stats: dict
+            rows transferred, seconds elapsed, rows per second and the key the
+            transfer resumed after
+    """
+    if mode not in ('replace', 'append'):
+        raise ValueError(f"Unknown mode '{mode}'.")
+    dest_table = dest_table or table_name
+    from_sqlite = isinstance(source_conn, sqlite3.Connection)
+    to_sqlite = isinstance(dest_conn, sqlite3.Connection)
+    if from_sqlite:
+        order_by = order_by or 'rowid'
+    if checkpoint_path and not order_by:
+        raise ValueError('A key column (order_by) is required for checkpoints.')
+
+    # Source columns and destination types
+    if from_sqlite:
+        info = source_conn.execute(f'PRAGMA table_info("{table_name}")').fetchall()
+        columns = [row[1] for row in info]
+        source_types = [row[2] for row in info]
+    else:
+        # data_type drives the mapping to SQLite; the full type (e.g. integer[]
+        # or numeric(10,2)) is what a PostgreSQL destination is created with
+        info = [row for batch in pgsql_db_ops.iter_query_pgsql(
+                    source_conn,
+                    'SELECT c.column_name, c.data_type, format_type(a.atttypid, a.atttypmod) '
+                    'FROM information_schema.columns c JOIN pg_attribute a '
+                    "ON a.attrelid = to_regclass(format('%%I.%%I', c.table_schema, c.table_name)) "
+                    'AND a.attname = c.column_name '
+                    'WHERE c.table_name = %s AND c.table_schema = current_schema() '
+                    'ORDER BY c.ordinal_position',
+                    (table_name,), output='rows')
+                for row in batch]
+        columns = [row[0] for row in info]
+        source_types = [row[1] for row in info]
+        full_types = [row[2] for row in info]
+    if not columns:
+        raise ValueError(f"Table '{table_name}' not found.")
+    if checkpoint_path and order_by != 'rowid':
+        if order_by not in columns:
+            raise ValueError(f"Key column '{order_by}' not found in table '{table_name}'.")
+        key_type = source_types[columns.index(order_by)].lower()
+        if (('BLOB' in key_type.upper()) if from_sqlite else
+                not (key_type in _checkpoint_pgsql_types or key_type.startswith(('timestamp', 'time')))):
+            raise ValueError(f"Key column '{order_by}' of type '{key_type}' cannot be saved "
+                             'in a checkpoint.')
+
+    if from_sqlite and not to_sqlite:
+        dest_types = [sqlite_to_pgsql_type(data_type) for data_type in source_types]
+        convert_row = _converter([_to_pgsql_value(data_type) for data_type in dest_types])
+    elif not from_sqlite and to_sqlite:
+        dest_types = [pgsql_to_sqlite_type(data_type) for data_type in source_types]
+        convert_row = _converter([_to_sqlite_value(data_type) for data_type in source_types])
+    elif from_sqlite:
+        dest_types = source_types
+        convert_row = None
+    else:
+        dest_types = full_types
+        convert_row = _converter([_copy_pgsql_value(data_type) for data_type in source_types])
+    schema = dict(zip(columns, dest_types))
+
+    # Resume from checkpoint
+    last_key = None
+    if checkpoint_path:
+        checkpoint_path = utils_file.add_suffix(checkpoint_path, '.json', '.json')
+    if checkpoint_path and Path(checkpoint_path).exists():
+        checkpoint = utils_file.read_json_file(checkpoint_path)
+        if checkpoint.get('table') == table_name and checkpoint.get('dest_table') == dest_table:
+            last_key = checkpoint['last_key']
+            mode = 'append'
+    resumed_from = last_key
+
+    # Destination table
+    column_sql = ', '.join(f'"{name}" {data_type}' for name, data_type in schema.items())
+    if to_sqlite:
+        if dest_conn.in_transaction:
+            dest_conn.commit()
+        if mode == 'replace':
+            dest_conn.execute(f'DROP TABLE IF EXISTS "{dest_table}"')
+        dest_conn.execute(f'CREATE TABLE IF NOT EXISTS "{dest_table}" ({column_sql})')
+        dest_conn.commit()
+    else:
+        pgsql_db_ops.copy_upload_table(dest_conn, [], dest_table, mode=mode,
+                                       columns=columns, schema=schema)
+
+    # Reader, selecting the key first when it is needed for checkpoints
+    quoted_columns = ', '.join(f'"{name}"' for name in columns)
+    select_sql = f'"{order_by}", {quoted_columns}' if checkpoint_path else quoted_columns
+    query = f'SELECT {select_sql} FROM "{table_name}"'
+    params = ()
+    if last_key is not None:
+        query += f' WHERE "{order_by}" > ' + ('?' if from_sqlite else '%s')
+        params = (last_key,)
+    if order_by:
+        query += f' ORDER BY "{order_by}"'
+    if from_sqlite:
+        chunks = sqlite_db_ops.iter_query_sqlite(source_conn, query, params, batch_size=chunk_rows)
+    else:
+        chunks = pgsql_db_ops.iter_query_pgsql(source_conn, query, params, itersize=chunk_rows,
+                                               output='rows')
+
+    # Writer, committing each chunk before recording it in the checkpoint
+    insert_sql = f'INSERT INTO "{dest_table}" ({quoted_columns}) VALUES ({", ".join("?" * len(columns))})'
+    count = 0
+
+    def write(chunk):
+        nonlocal count
+        rows = [row[1:] for row in chunk] if checkpoint_path else chunk
+        if convert_row:
+            rows = [convert_row(row) for row in rows]
+        if to_sqlite:
+            if not dest_conn.in_transaction:
+                dest_conn.execute('BEGIN')
+            try:
+                dest_conn.executemany(insert_sql, rows)
+                dest_conn.commit()
+            except BaseException:
+                dest_conn.rollback()
+                raise
+        else:
+            pgsql_db_ops.copy_upload_table(dest_conn, rows, dest_table, mode='append',
+                                           columns=columns, schema=schema)
+        count += len(rows)
+        if checkpoint_path:
+            _write_checkpoint(checkpoint_path, {'table': table_name,
+                                                'dest_table': dest_table,
+                                                'last_key': _checkpoint_key(chunk[-1][0])})
+
+    start = time.perf_counter()
+    if from_sqlite and to_sqlite:
+        # Both connections must stay on the calling thread
+        for chunk in chunks:
+            write(chunk)
+    else:
+        # SQLite connections stay on the calling thread; PostgreSQL runs on the worker
+        _run_pipeline(chunks, write, queue_size, read_in_thread=not from_sqlite)
+    seconds = time.perf_counter() - start
+
+    if checkpoint_path:
+        Path(checkpoint_path).unlink(missing_ok=True)
+
+    return {'rows': count, 'seconds': seconds,
+            'rows_per_second': count / seconds if seconds else 0.0,
+            'resumed_from': resumed_from}
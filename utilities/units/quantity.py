@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Array-backed quantities carrying a unit through arithmetic.
+
+Author:     agent
+Created:    2026-10-18
+"""
+
+import operator
+
+import numpy as np
+
+from utilities.units.units import _get_factors, _get_unit_ids
+
+#-------------------------------------------------------------------------------
+class Quantity:
+    """
+    One ndarray of values with a single unit tag.
+
+    Values are held as a float ndarray, so a batch of measurements costs one
+    array rather than one Python object per element. Addition, subtraction and
+    comparison with another Quantity convert its values to this Quantity's
+    unit; multiplication and division are by unitless scalars or arrays.
+    Operands of other types return NotImplemented, so e.g. q == None is False.
+    NumPy arrays and scalars on the left of an operator go through the
+    reflected operators, so array * q is a Quantity and array + q raises.
+
+    Parameters
+    ----------
+    value : float or array_like
+        The value(s) of the quantity.
+    unit : str
+        The unit of the values.
+    """
+    __slots__ = ('value', 'unit')
+
+    # Make NumPy operands on the left defer to the reflected operators
+    # instead of converting the quantity to a unitless array
+    __array_ufunc__ = None
+
+    def __init__(self, value, unit: str):
+        _get_unit_ids(unit)
+        self.value = np.asarray(value, dtype=float)
+        self.unit = unit
+
+    #---------------------------------------------------------------------------
+    def to(self, unit: str) -> 'Quantity':
+        """
+        Convert the quantity to another unit.
+
+        Parameters
+        ----------
+        unit : str
+            The unit to convert to.
+
+        Returns
+        -------
+        Quantity
+            A new quantity in the given unit.
+        """
+        if unit == self.unit:
+            return Quantity(self.value, unit)
+        return Quantity(self.value * _get_factors(self.unit, unit), unit)
+
+    def _values_in_unit(self, other):
+        """
+        Values of a Quantity operand in this quantity's unit, or NotImplemented
+        for any other operand.
+        """
+        if not isinstance(other, Quantity):
+            return NotImplemented
+        if other.unit == self.unit:
+            return other.value
+        return other.value * _get_factors(other.unit, self.unit)
+
+    #---------------------------------------------------------------------------
+    # Arithmetic
+    def __add__(self, other):
+        values = self._values_in_unit(other)
+        if values is NotImplemented:
+            return NotImplemented
+        return Quantity(self.value + values, self.unit)
+
+    def __radd__(self, other):
+        # Zero is accepted as the start value of sum()
+        if isinstance(other, (int, float)) and other == 0:
+            return Quantity(self.value, self.unit)
+        return NotImplemented
+
+    def __sub__(self, other):
+        values = self._values_in_unit(other)
+        if values is NotImplemented:
+            return NotImplemented
+        return Quantity(self.value - values, self.unit)
+
+    def __mul__(self, other):
+        if isinstance(other, Quantity):
+            return NotImplemented
+        return Quantity(self.value * other, self.unit)
+
+    def __rmul__(self, other):
+        if isinstance(other, Quantity):
+            return NotImplemented
+        return Quantity(other * self.value, self.unit)
+
+    def __truediv__(self, other):
+        if isinstance(other, Quantity):
+            # Ratio of like quantities is a unitless array
+            return self.value / self._values_in_unit(other)
+        return Quantity(self.value / other, self.unit)
+
+    def __neg__(self):
+        return Quantity(-self.value, self.unit)
+
+    def __abs__(self):
+        return Quantity(np.abs(self.value), self.unit)
+
+    #---------------------------------------------------------------------------
+    # Comparison
+    def _compare(self, other, op):
+        values = self._values_in_unit(other)
+        if values is NotImplemented:
+            return NotImplemented
+        return op(self.value, values)
+
+    def __eq__(self, other):
+        return self._compare(other, operator.eq)
+
+    def __ne__(self, other):
+        return self._compare(other, operator.ne)
+
+    def __lt__(self, other):
+        return self._compare(other, operator.lt)
+
+    def __le__(self, other):
+        return self._compare(other, operator.le)
+
+    def __gt__(self, other):
+        return self._compare(other, operator.gt)
+
+    def __ge__(self, other):
+        return self._compare(other, operator.ge)
+
+    __hash__ = None
+
+    #---------------------------------------------------------------------------
+    # Reductions
+    def sum(self, axis=None, **kwargs) -> 'Quantity':
+        return Quantity(self.value.sum(axis=axis, **kwargs), self.unit)
+
+    def mean(self, axis=None, **kwargs) -> 'Quantity':
+        return Quantity(self.value.mean(axis=axis, **kwargs), self.unit)
+
+    def min(self, axis=None, **kwargs) -> 'Quantity':
+        return Quantity(self.value.min(axis=axis, **kwargs), self.unit)
+
+    def max(self, axis=None, **kwargs) -> 'Quantity':
+        return Quantity(self.value.max(axis=axis, **kwargs), self.unit)
+
+    def std(self, axis=None, **kwargs) -> 'Quantity':
+        return Quantity(self.value.std(axis=axis, **kwargs), self.unit)
+
+    #---------------------------------------------------------------------------
+    # Container
+    def __len__(self) -> int:
+        return len(self.value)
+
+    def __getitem__(self, key) -> 'Quantity':
+        return Quantity(self.value[key], self.unit)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.value if dtype is None else self.value.astype(dtype)
+
+    @property
+    def shape(self) -> tuple:
+        return self.value.shape
+
+    def __repr__(self) -> str:
+        return f'Quantity({self.value!r}, {self.unit!r})'
@@ -7,24 +7,255 @@ Created:    2025-04-06
 """
 
 import csv
+import hashlib
 from importlib import resources
-import pandas as pd
+import json
+import os
+from pathlib import Path
+import pickle
+import numpy as np
 
-# Load constants and conversion factors from CSV files
-with resources.open_text('utilities.units', 'constants_codata.csv') as f:
-    for i in range(4):
-        next(f)
-    rows = csv.DictReader(f)
-    constants_codata = {row['constant_name']: float(row['value']) for row in rows}
+# Source tables shipped with the package; the parsed and compiled form is
+# cached in a pickle that is rebuilt whenever any of these files or this
+# module's source change
+table_files = ['constants_codata.csv', 'constants_physical.csv', 'conversion_factors.csv']
+cache_file = Path(os.environ.get('UTILITIES_CACHE_DIR', Path.home() / '.cache' / 'utilities'),
+                  'units_tables.pickle')
+cache_version = 1
 
-with resources.open_text('utilities.units', 'constants_physical.csv') as f:
-    rows = csv.DictReader(f)
-    constants_physical = {row['constant_name']: float(row['value']) for row in rows}
+# Links between metric units that are not listed in conversion_factors.csv,
+# needed to connect e.g. foot (-> meter) with mile (-> kilometer)
+metric_links = [('kilometer', 'meter', 1000.0),
+                ('megajoule', 'joule', 1.0e6)]
 
+#-------------------------------------------------------------------------------
+def _build_factor_matrix(edges: list) -> tuple:
+    """
+    Build the conversion graph from (from unit, to unit, factor) edges and
+    close it transitively.
+
+    Returns the sorted list of unit names, a dict of unit name -> unit id and
+    a dense matrix such that value_in_to = value_in_from * matrix[from, to].
+    Pairs of units with no path between them are NaN.
+    """
+    graph = {}
+    for src, dst, factor in edges:
+        graph.setdefault(src, []).append((dst, factor))
+        graph.setdefault(dst, []).append((src, 1.0 / factor))
+
+    unit_names = sorted(graph)
+    unit_ids = {unit: i for i, unit in enumerate(unit_names)}
+
+    # Walk each connected component once, expressing every unit as a multiple
+    # of the component's root unit; any pair within a component then converts
+    # through the root
+    component = np.full(len(unit_names), -1)
+    to_root = np.ones(len(unit_names))
+    for root in unit_names:
+        if component[unit_ids[root]] >= 0:
+            continue
+        component[unit_ids[root]] = unit_ids[root]
+        stack = [root]
+        while stack:
+            unit = stack.pop()
+            for neighbour, factor in graph[unit]:
+                if component[unit_ids[neighbour]] < 0:
+                    component[unit_ids[neighbour]] = unit_ids[root]
+                    to_root[unit_ids[neighbour]] = to_root[unit_ids[unit]] / factor
+                    stack.append(neighbour)
+
+    matrix = to_root[:, None] / to_root[None, :]
+    matrix[component[:, None] != component[None, :]] = np.nan
+
+    # Keep listed factors exact rather than rounded through the root unit
+    for src, dst, factor in edges:
+        matrix[unit_ids[src], unit_ids[dst]] = factor
+        matrix[unit_ids[dst], unit_ids[src]] = 1.0 / factor
+    np.fill_diagonal(matrix, 1.0)
+
+    return unit_names, unit_ids, matrix
+
+#-------------------------------------------------------------------------------
+def _parse_tables() -> dict:
+    """
+    Parse constants and conversion factors from the CSV files and compile the
+    conversion factor matrix.
+    """
+    with resources.open_text('utilities.units', 'constants_codata.csv') as f:
+        for i in range(4):
+            next(f)
+        rows = csv.DictReader(f)
+        constants_codata = {row['constant_name']: float(row['value']) for row in rows}
+
+    with resources.open_text('utilities.units', 'constants_physical.csv') as f:
+        rows = csv.DictReader(f)
+        constants_physical = {row['constant_name']: float(row['value']) for row in rows}
+
+    with resources.files('utilities.units').joinpath('conversion_factors.csv').open('r', encoding='utf-8') as f:
+        for i in range(2):
+            next(f)
+        rows = csv.DictReader(f)
+        conversion_rows = [(row['group'], row['source_unit'], row['metric_unit'],
+                            float(row['conversion_factor'])) for row in rows]
+
+    unit_names, unit_ids, factor_matrix = _build_factor_matrix(
+        [(src, met, fac) for _, src, met, fac in conversion_rows] + metric_links)
+
+    return {'constants_codata': constants_codata,
+            'constants_physical': constants_physical,
+            'conversion_rows': conversion_rows,
+            'unit_names': unit_names,
+            'unit_ids': unit_ids,
+            'factor_matrix': factor_matrix}
+
+#-------------------------------------------------------------------------------
+def _tables_key():
+    """
+    Key identifying the current state of the source tables and of the code
+    compiling them, from the size and modification time of each file and a
+    hash of this module's source. None if the files cannot be stat'ed (e.g.
+    the package is imported from a zip archive).
+    """
+    try:
+        package_dir = resources.files('utilities.units')
+        source_hash = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+        return [cache_version, source_hash] + [[name, st.st_size, st.st_mtime_ns] for name in table_files
+                                              for st in [os.stat(str(package_dir.joinpath(name)))]]
+    except (OSError, TypeError):
+        return None
+
+#-------------------------------------------------------------------------------
+def _cache_trusted() -> bool:
+    """
+    Whether the cache file is owned by the current user and not writable by
+    others, so that it is safe to unpickle.
+    """
+    st = os.stat(cache_file)
+    if hasattr(os, 'getuid') and st.st_uid != os.getuid():
+        return False
+    return not st.st_mode & 0o022
+
+#-------------------------------------------------------------------------------
+def _load_tables() -> dict:
+    """
+    Load the compiled tables from the cache, parsing the CSV files and
+    refreshing the cache only when it is missing or stale.
+
+    The cache file holds the key as a JSON line followed by the pickle, so the
+    pickle is only loaded once the key matches and the file is trusted.
+    """
+    key = _tables_key()
+    if key is not None:
+        try:
+            with open(cache_file, 'rb') as f:
+                if json.loads(f.readline()) == key and _cache_trusted():
+                    return pickle.load(f)
+        except Exception:
+            pass
+
+    tables = _parse_tables()
+    if key is not None:
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = cache_file.with_name(f'{cache_file.name}.{os.getpid()}.tmp')
+            with open(tmp_file, 'wb') as f:
+                f.write(json.dumps(key).encode('utf-8') + b'\n')
+                pickle.dump(tables, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.chmod(tmp_file, 0o644)
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            pass
+
+    return tables
+
+# Load constants and conversion factors
+_tables = _load_tables()
+constants_codata = _tables['constants_codata']
+constants_physical = _tables['constants_physical']
 constants = {**constants_codata, **constants_physical}
+unit_names = _tables['unit_names']
+unit_ids = _tables['unit_ids']
+factor_matrix = _tables['factor_matrix']
+
+#-------------------------------------------------------------------------------
+def __getattr__(name: str):
+    """
+    Build the conversion_factors DataFrame on first access, so that pandas is
+    only imported when a DataFrame view is actually requested.
+    """
+    if name == 'conversion_factors':
+        import pandas as pd
+        global conversion_factors
+        conversion_factors = pd.DataFrame(_tables['conversion_rows'],
+                                          columns=['group', 'source_unit', 'metric_unit',
+                                                   'conversion_factor'])
+        return conversion_factors
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+#-------------------------------------------------------------------------------
+def _as_values(value):
+    """
+    Return scalars and array types (ndarrays, Series) unchanged and coerce any other
+    sequence (e.g. list or tuple) to a float ndarray for vectorized arithmetic.
+    """
+    if np.isscalar(value) or hasattr(value, 'dtype'):
+        return value
+    return np.asarray(value, dtype=float)
+
+#-------------------------------------------------------------------------------
+def _get_unit_ids(unit):
+    """
+    Map a unit name, or an array of unit names, to unit ids. Each distinct
+    name in an array is looked up only once.
+    """
+    if isinstance(unit, str):
+        try:
+            return unit_ids[unit]
+        except KeyError:
+            raise ValueError(f"Unit '{unit}' not found.")
+
+    names, idx = np.unique(np.asarray(unit, dtype=object).astype(str), return_inverse=True)
+    try:
+        ids = np.array([unit_ids[name] for name in names], dtype=np.intp)
+    except KeyError as error:
+        raise ValueError(f"Unit '{error.args[0]}' not found.")
 
-with resources.files('utilities.units').joinpath('conversion_factors.csv').open('r', encoding='utf-8') as f:
-    conversion_factors = pd.read_csv(f, skiprows=2)
+    return ids[idx].reshape(np.shape(unit))
+
+#-------------------------------------------------------------------------------
+def _get_factors(from_unit, to_unit):
+    """
+    Look up the conversion factor between two units in the factor matrix.
+
+    Either unit may be given as a single string or as an array of unit names,
+    in which case an ndarray of factors broadcast over both is returned.
+    """
+    try:
+        factor = factor_matrix[_get_unit_ids(from_unit), _get_unit_ids(to_unit)]
+    except ValueError:
+        raise ValueError(f"Conversion from '{from_unit}' to '{to_unit}' not found.")
+
+    if np.isnan(factor).any():
+        raise ValueError(f"Conversion from '{from_unit}' to '{to_unit}' not found.")
+
+    return factor
+
+#-------------------------------------------------------------------------------
+def get_unit_id(unit: str) -> int:
+    """
+    Get the id of a unit, i.e. its row and column in the factor matrix.
+
+    Parameters
+    ----------
+    unit : str
+        The name of the unit.
+
+    Returns
+    -------
+    int
+        The id of the unit.
+    """
+    return _get_unit_ids(unit)
 
 #-------------------------------------------------------------------------------
 def get_constant(constant_name: str) -> float:
@@ -48,64 +279,111 @@ def get_constant(constant_name: str) -> float:
         raise KeyError(f"Constant '{constant_name}' not found.")
 
 #-------------------------------------------------------------------------------
-def to_metric(customary_value: float, 
-               customary_unit: str,
-               metric_unit: str) -> float:
+def to_metric(customary_value, 
+               customary_unit,
+               metric_unit):
     """
     Convert a value from customary units to metric units.
 
+    Values may be a scalar, a sequence, a NumPy array or a pandas Series; the
+    conversion is a single vectorized multiply. Units may be a single name or
+    an array of names matching the values, for columns with mixed units.
+
     Parameters
     ----------
-    customary_value : float
+    customary_value : float, array_like or pd.Series
         The value in customary units.
-    customary_unit : str
+    customary_unit : str or array_like of str
         The unit of the value in customary units.
-    metric_unit : str
+    metric_unit : str or array_like of str
         The unit to convert to in metric units.
 
     Returns
     -------
-    float
+    float, np.ndarray or pd.Series
         The value in metric units.
     """
-    try:
-        factor = conversion_factors.loc[(conversion_factors['source_unit'] == customary_unit) & 
-                                        (conversion_factors['metric_unit'] == metric_unit), 
-                                        'conversion_factor'].values[0]
-    except:
-        raise ValueError(f"Conversion from '{customary_unit}' to '{metric_unit}' not found.")
+    factor = _get_factors(customary_unit, metric_unit)
     
-    return customary_value * factor
+    return _as_values(customary_value) * factor
 
 #-------------------------------------------------------------------------------
-def to_customary(metric_value: float,
-                  metric_unit: str,
-                  customary_unit: str) -> float:
+def to_customary(metric_value,
+                  metric_unit,
+                  customary_unit):
     """
     Convert a value from metric units to customary units.
 
+    Values may be a scalar, a sequence, a NumPy array or a pandas Series; the
+    conversion is a single vectorized divide. Units may be a single name or
+    an array of names matching the values, for columns with mixed units.
+
     Parameters
     ----------
-    metric_value : float
+    metric_value : float, array_like or pd.Series
         The value in metric units.
-    metric_unit : str
+    metric_unit : str or array_like of str
         The unit of the value in metric units.
-    customary_unit : str
+    customary_unit : str or array_like of str
         The unit to convert to in customary units.
 
     Returns
     -------
-    float
+    float, np.ndarray or pd.Series
         The value in customary units.
     """
     try:
-        factor = conversion_factors.loc[(conversion_factors['metric_unit'] == metric_unit) & 
-                                        (conversion_factors['source_unit'] == customary_unit), 
-                                        'conversion_factor'].values[0]
-    except:
+        factor = _get_factors(customary_unit, metric_unit)
+    except ValueError:
         raise ValueError(f"Conversion from '{metric_unit}' to '{customary_unit}' not found.")
     
-    return metric_value / factor
+    return _as_values(metric_value) / factor
+
+#-------------------------------------------------------------------------------
+def convert(value,
+            from_unit,
+            to_unit):
+    """
+    Convert a value between any two connected units, including customary to
+    customary (e.g. foot to inch) via the transitively closed factor matrix.
+
+    Parameters
+    ----------
+    value : float, array_like or pd.Series
+        The value in the source units.
+    from_unit : str or array_like of str
+        The unit of the value.
+    to_unit : str or array_like of str
+        The unit to convert to.
+
+    Returns
+    -------
+    float, np.ndarray or pd.Series
+        The value in the target units.
+    """
+    factor = _get_factors(from_unit, to_unit)
+
+    return _as_values(value) * factor
+
+#-------------------------------------------------------------------------------
+def convert_batch(triples) -> np.ndarray:
+    """
+    Convert a batch of (value, from unit, to unit) triples in one pass.
+
+    Parameters
+    ----------
+    triples : array_like
+        Sequence of (value, from_unit, to_unit) triples, or an equivalent
+        array with three columns.
+
+    Returns
+    -------
+    np.ndarray
+        The converted values, in the order given.
+    """
+    columns = np.asarray(triples, dtype=object).reshape(-1, 3).T
+
+    return convert(columns[0].astype(float), columns[1], columns[2])
 
 #-------------------------------------------------------------------------------
 def format_unit(unit: str) -> str:
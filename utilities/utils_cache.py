@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Binary cache for data loaded from files that are read repeatedly.
+
+Author:     agent
+Created:    2026-10-18
+"""
+
+from pathlib import Path
+import hashlib
+import json
+import os
+import pickle
+
+
+def get_file_hash(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """
+    Get SHA-256 hash of the contents of file at given path, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as in_file:
+        while block := in_file.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FileCache:
+    """
+    Cache of data loaded from source files, stored as pickles for fast loading.
+
+    Entries are keyed on the source path and the loader and its arguments, and
+    are valid while the source keeps its size and modification time. If only
+    the modification time changed, the content hash decides whether the entry
+    is still valid. Entries in the cache directory are evicted least recently
+    used first once their total size exceeds max_bytes.
+
+    :param cache_dir: Directory for cache entries, defaults to UTILITIES_CACHE_DIR or ~/.cache/utilities, under 'files'
+    :param max_bytes: Maximum total size of entries in the cache directory
+    :param sidecar: If True, store each entry next to its source file instead of in cache_dir
+    """
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = 1024 ** 3, sidecar: bool = False):
+        if cache_dir is None:
+            cache_dir = Path(os.environ.get('UTILITIES_CACHE_DIR', Path.home() / '.cache' / 'utilities'), 'files')
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.sidecar = sidecar
+        self.hits = 0
+        self.misses = 0
+
+    def _entry_path(self, file_path: str, loader, kwargs: dict) -> Path:
+        """
+        Path of the data pickle for a source file loaded with given loader and arguments.
+        """
+        key = json.dumps([os.path.abspath(file_path), loader.__module__, loader.__qualname__,
+                          sorted(kwargs.items())], default=str)
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+        if self.sidecar:
+            source = Path(file_path)
+            return source.with_name(f'.{source.name}.{digest}.cache')
+        return self.cache_dir / f'{digest}.cache'
+
+    def _write(self, path: Path, write, mode: str):
+        """
+        Write a file atomically through a temporary file.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        with open(tmp_path, mode) as out_file:
+            write(out_file)
+        os.replace(tmp_path, path)
+
+    def load(self, file_path: str, loader, **kwargs):
+        """
+        Load data from file at given path through the cache, calling loader(file_path, **kwargs)
+        on a miss and storing its result.
+
+        :param file_path: Path of the source file
+        :param loader: Function that loads data from the source file
+        :return: Data loaded from the source file or the cache
+        """
+        entry = self._entry_path(file_path, loader, kwargs)
+        meta_path = entry.with_name(entry.name + '.meta')
+        stat = os.stat(file_path)
+
+        try:
+            with open(meta_path, 'r') as meta_file:
+                meta = json.load(meta_file)
+            valid = meta['size'] == stat.st_size and meta['mtime_ns'] == stat.st_mtime_ns
+            if not valid and meta['size'] == stat.st_size and meta['sha256'] == get_file_hash(file_path):
+                meta['mtime_ns'] = stat.st_mtime_ns
+                self._write(meta_path, lambda out_file: json.dump(meta, out_file), 'w')
+                valid = True
+            if valid:
+                with open(entry, 'rb') as in_file:
+                    data = pickle.load(in_file)
+                os.utime(entry)
+                self.hits += 1
+                return data
+        except (OSError, ValueError, KeyError, EOFError, pickle.UnpicklingError):
+            pass
+
+        self.misses += 1
+        data = loader(file_path, **kwargs)
+        meta = {'source': os.path.abspath(file_path), 'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns, 'sha256': get_file_hash(file_path)}
+        try:
+            self._write(entry, lambda out_file: pickle.dump(data, out_file, protocol=pickle.HIGHEST_PROTOCOL), 'wb')
+            self._write(meta_path, lambda out_file: json.dump(meta, out_file), 'w')
+        except OSError:
+            pass
+        if not self.sidecar:
+            self.evict()
+        return data
+
+    def evict(self):
+        """
+        Remove least recently used entries from the cache directory until their
+        total size is within max_bytes.
+        """
+        try:
+            entries = [(path.stat(), path) for path in self.cache_dir.glob('*.cache')]
+        except OSError:
+            return
+        entries.sort(key=lambda entry: entry[0].st_mtime)
+        total = sum(stat.st_size for stat, _ in entries)
+        for stat, path in entries:
+            if total <= self.max_bytes:
+                break
+            for stale in (path, path.with_name(path.name + '.meta')):
+                try:
+                    stale.unlink()
+                except OSError:
+                    pass
+            total -= stat.st_size
+
+    def clear(self):
+        """
+        Remove all entries from the cache directory.
+        """
+        for path in list(self.cache_dir.glob('*.cache')) + list(self.cache_dir.glob('*.cache.meta')):
+            path.unlink(missing_ok=True)
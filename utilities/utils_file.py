@@ -6,9 +6,23 @@ Author:     Kushal Moolchandani
 Created:    2025-02-19
 """
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from itertools import islice
 from pathlib import Path
+from typing import AsyncIterator, Callable, Iterator, NamedTuple, Optional
+import asyncio
+import bz2
 import csv
+import glob
+import gzip
+import io
 import json
+import lzma
+import mmap
+import numpy as np
+
+from utilities import utils_time
+from utilities.utils_cache import FileCache
 
 
 def make_dir_at_path(path: str):
@@ -18,66 +32,529 @@ def make_dir_at_path(path: str):
     Path(path).mkdir(parents=True, exist_ok=True)
 
 
+# Compression modules by file extension, used transparently by every reader and writer
+compression_openers = {'.gz': gzip, '.bz2': bz2, '.xz': lzma, '.lzma': lzma}
+
+
+def get_compression(file_path: str) -> Optional[str]:
+    """
+    Get the compression extension of file at given path, or None if it is not compressed.
+    """
+    for extension in compression_openers:
+        if file_path.endswith(extension):
+            return extension
+    return None
+
+
+def add_suffix(file_path: str, suffixes, default: str) -> str:
+    """
+    Append default suffix to file path if none of the given suffixes is present,
+    placing it before any compression extension (e.g. 'data.gz' -> 'data.csv.gz').
+    """
+    compression = get_compression(file_path) or ''
+    base = file_path[:len(file_path) - len(compression)]
+    if not base.endswith(suffixes):
+        base += default
+    return base + compression
+
+
 def open_file_at_path(file_path: str, mode: str):
     """
     Open file at given path with given mode, creating any parent directories as needed.
+    Files ending in '.gz', '.bz2', '.xz' or '.lzma' are compressed and decompressed
+    transparently as they are streamed.
     """
     make_dir_at_path(str(Path(file_path).parent))
-    return open(file_path, mode)
+    compression = get_compression(file_path)
+    if compression is None:
+        return open(file_path, mode)
+    if 'b' not in mode and 't' not in mode:
+        mode += 't'
+    return compression_openers[compression].open(file_path, mode)
 
 
-def write_json_file(out_file_w_path: str, json_data: dict):
+def write_json_file(out_file_w_path: str, json_data: dict, compact: bool = False):
     """
     Write JSON data to file at given path. Append '.json' if not present.
 
     :param out_file_w_path: Path to write JSON data to
     :param json_data: JSON data to write
+    :param compact: If True, write without indentation or whitespace between items
     """
-    if not out_file_w_path.endswith('.json'):
-        out_file_w_path += '.json'
+    out_file_w_path = add_suffix(out_file_w_path, '.json', '.json')
     with open_file_at_path(out_file_w_path, 'w') as out_file:
-        json.dump(json_data, out_file, indent=4)
+        if compact:
+            json.dump(json_data, out_file, separators=(',', ':'))
+        else:
+            json.dump(json_data, out_file, indent=4)
 
 
-def read_json_file(in_file_w_path: str):
+def read_json_file(in_file_w_path: str, cache: Optional[FileCache] = None):
     """
     Read JSON data from file at given path. Append '.json' if not present.
 
     :param in_file_w_path: Path to read JSON data from
+    :param cache: If given, load through this cache, reparsing only when the file changes
     :return: JSON data read from file
     """
-    if not in_file_w_path.endswith('.json'):
-        in_file_w_path += '.json'
+    in_file_w_path = add_suffix(in_file_w_path, '.json', '.json')
+    if cache is not None:
+        return cache.load(in_file_w_path, read_json_file)
     with open_file_at_path(in_file_w_path, 'r') as in_file:
         return json.load(in_file)
 
 
-def write_csv_file(out_file_w_path: str, csv_data: list, delimiter: str = ','):
+def write_jsonl_file(out_file_w_path: str, records, append: bool = True) -> int:
+    """
+    Write records to a JSON Lines (NDJSON) file at given path, one compact JSON
+    document per line. Append '.jsonl' if neither '.jsonl' nor '.ndjson' is present.
+
+    :param out_file_w_path: Path to write JSON Lines data to
+    :param records: Any iterable of JSON-serializable records
+    :param append: If True, append to an existing file instead of overwriting it
+    :return: Byte offset of the end of the (decompressed) file after writing
+    """
+    out_file_w_path = add_suffix(out_file_w_path, ('.jsonl', '.ndjson'), '.jsonl')
+    offset = 0
+    if append and get_compression(out_file_w_path) and Path(out_file_w_path).exists():
+        # Appending to a compressed file adds a new member, whose tell() only
+        # counts its own bytes, so add the decompressed size of what is there
+        with open_file_at_path(out_file_w_path, 'rb') as in_file:
+            while block := in_file.read(1024 * 1024):
+                offset += len(block)
+    with open_file_at_path(out_file_w_path, 'ab' if append else 'wb') as out_file:
+        for record in records:
+            out_file.write(json.dumps(record, separators=(',', ':')).encode('utf-8'))
+            out_file.write(b'\n')
+        return offset + out_file.tell()
+
+
+def iter_jsonl_file(in_file_w_path: str, offset: int = 0, with_offsets: bool = False) -> Iterator:
+    """
+    Iterate over records of a JSON Lines (NDJSON) file at given path, one line
+    at a time. Append '.jsonl' if neither '.jsonl' nor '.ndjson' is present.
+
+    To resume a partially processed file, pass the offset yielded with the last
+    record handled (with_offsets=True) or the offset returned by write_jsonl_file.
+
+    :param in_file_w_path: Path to read JSON Lines data from
+    :param offset: Byte offset of the start of a line to begin reading at
+    :param with_offsets: If True, yield (offset after record, record) pairs
+    :return: Iterator over records
+    """
+    in_file_w_path = add_suffix(in_file_w_path, ('.jsonl', '.ndjson'), '.jsonl')
+    with open_file_at_path(in_file_w_path, 'rb') as in_file:
+        in_file.seek(offset)
+        for line in in_file:
+            offset += len(line)
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if with_offsets:
+                yield offset, record
+            else:
+                yield record
+
+
+class CSVWriter:
+    """
+    Buffered CSV writer for rows from any iterable or generator. Append '.csv'
+    if not present.
+
+    Rows are collected in a buffer of up to buffer_size rows and written with
+    a single csv.writer using writerows. Use as a context manager so producers
+    can add rows incrementally and have the buffer flushed on exit.
+
+    :param out_file_w_path: Path to write CSV data to
+    :param delimiter: Delimiter to use for CSV data
+    :param buffer_size: Number of rows to buffer between writes, at least 1
+    :param append: If True, append to an existing file instead of overwriting it
+    """
+
+    def __init__(self, out_file_w_path: str, delimiter: str = ',',
+                 buffer_size: int = 10000, append: bool = False):
+        if buffer_size < 1:
+            raise ValueError(f"Buffer size must be at least 1, given {buffer_size}")
+        out_file_w_path = add_suffix(out_file_w_path, '.csv', '.csv')
+        self.buffer_size = buffer_size
+        self._buffer = []
+        self._file = open_file_at_path(out_file_w_path, 'a' if append else 'w')
+        self._writer = csv.writer(self._file, delimiter=delimiter)
+
+    def writerow(self, row):
+        """
+        Add one row, writing out the buffer once it is full.
+        """
+        self._buffer.append(row)
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def writerows(self, rows):
+        """
+        Add rows from any iterable, writing them in batches of buffer_size.
+        """
+        rows = iter(rows)
+        self._buffer.extend(islice(rows, self.buffer_size - len(self._buffer)))
+        while len(self._buffer) >= self.buffer_size:
+            self.flush()
+            self._buffer.extend(islice(rows, self.buffer_size))
+
+    def flush(self):
+        """
+        Write out buffered rows.
+        """
+        if self._buffer:
+            self._writer.writerows(self._buffer)
+            self._buffer.clear()
+
+    def close(self):
+        """
+        Write out buffered rows and close the file.
+        """
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def write_csv_file(out_file_w_path: str, csv_data, delimiter: str = ',',
+                   buffer_size: int = 10000, append: bool = False):
     """
     Write CSV data to file at given path. Append '.csv' if not present.
 
     :param out_file_w_path: Path to write CSV data to
-    :param csv_data: CSV data to write
+    :param csv_data: CSV data to write, as any iterable of rows (e.g. list or generator)
     :param delimiter: Delimiter to use for CSV data
+    :param buffer_size: Number of rows to buffer between writes
+    :param append: If True, append to an existing file instead of overwriting it
     """
-    if not out_file_w_path.endswith('.csv'):
-        out_file_w_path += '.csv'
-    with open_file_at_path(out_file_w_path, 'w') as out_file:
-        for row in csv_data:
-            writer = csv.writer(out_file, delimiter=delimiter)
-            writer.writerow(row)
+    with CSVWriter(out_file_w_path, delimiter=delimiter,
+                   buffer_size=buffer_size, append=append) as writer:
+        writer.writerows(csv_data)
+
+
+def iter_csv_file(in_file_w_path: str,
+                  delimiter: str = ',',
+                  header: bool = False,
+                  skip_rows: int = 0,
+                  chunk_size: Optional[int] = None) -> Iterator:
+    """
+    Iterate over CSV data from file at given path without reading the whole
+    file into memory. Append '.csv' if not present.
+
+    :param in_file_w_path: Path to read CSV data from
+    :param delimiter: Delimiter to use for CSV data
+    :param header: If True, treat the first row (after skipped rows) as column names and yield rows as dicts
+    :param skip_rows: Number of leading lines to skip before reading
+    :param chunk_size: If given, yield lists of up to this many rows instead of single rows
+    :return: Iterator over rows, or over chunks of rows
+    """
+    in_file_w_path = add_suffix(in_file_w_path, '.csv', '.csv')
+    with open_file_at_path(in_file_w_path, 'r') as in_file:
+        for _ in range(skip_rows):
+            if not in_file.readline():
+                return
+        if header:
+            reader = csv.DictReader(in_file, delimiter=delimiter)
+        else:
+            reader = csv.reader(in_file, delimiter=delimiter)
+        if chunk_size is None:
+            yield from reader
+        else:
+            while chunk := list(islice(reader, chunk_size)):
+                yield chunk
 
 
-def read_csv_file(in_file_w_path: str, delimiter: str = ','):
+def read_csv_file(in_file_w_path: str, delimiter: str = ',', cache: Optional[FileCache] = None):
     """
     Read CSV data from file at given path. Append '.csv' if not present.
     
     :param in_file_w_path: Path to read CSV data from
     :param delimiter: Delimiter to use for CSV data
+    :param cache: If given, load through this cache, reparsing only when the file changes
     :return: CSV data read from file
     """
-    if not in_file_w_path.endswith('.csv'):
-        in_file_w_path += '.csv'
-    with open_file_at_path(in_file_w_path, 'r') as in_file:
-        reader = csv.reader(in_file, delimiter=delimiter)
-        return [row for row in reader]
\ No newline at end of file
+    if cache is not None:
+        in_file_w_path = add_suffix(in_file_w_path, '.csv', '.csv')
+        return cache.load(in_file_w_path, read_csv_file, delimiter=delimiter)
+    return list(iter_csv_file(in_file_w_path, delimiter=delimiter))
+
+
+
+def read_csv_typed(in_file_w_path: str,
+                   schema: dict,
+                   delimiter: str = ',',
+                   skip_rows: int = 0,
+                   as_dict: bool = False,
+                   chunk_size: int = 100000):
+    """
+    Read CSV data from file at given path into typed NumPy arrays. Append '.csv'
+    if not present. The first row (after skipped rows) must hold column names.
+
+    Only the columns named in the schema are loaded, in schema order. Columns
+    with a datetime64 dtype are parsed from RFC3339 timestamps, keeping
+    fractional seconds and converting offsets to UTC. Columns with a bool dtype
+    accept 'true'/'false' or '1'/'0' in any case. Blank lines are skipped
+    and rows with fewer fields than the header raise ValueError. The file is
+    read in chunks of rows and each column is converted one chunk at a time,
+    without per-cell Python conversion.
+
+    :param in_file_w_path: Path to read CSV data from
+    :param schema: Dict of column name to NumPy dtype (e.g. {'id': int, 'speed': 'f4', 'time': 'datetime64[ns]'})
+    :param delimiter: Delimiter to use for CSV data
+    :param skip_rows: Number of leading lines to skip before the header row
+    :param as_dict: If True, return a dict of column name to array instead of a structured array
+    :param chunk_size: Number of rows converted at a time
+    :return: NumPy structured array, or dict of column arrays
+    """
+    dtypes = {name: np.dtype(dtype) for name, dtype in schema.items()}
+    columns = {name: [] for name in dtypes}
+    column_idx = None
+    row_number = skip_rows
+    for chunk in iter_csv_file(in_file_w_path, delimiter=delimiter,
+                               skip_rows=skip_rows, chunk_size=chunk_size):
+        if column_idx is None:
+            while chunk and not chunk[0]:
+                chunk.pop(0)
+                row_number += 1
+            if not chunk:
+                continue
+            header = chunk.pop(0)
+            row_number += 1
+            missing = [name for name in dtypes if name not in header]
+            if missing:
+                raise KeyError(f"Columns {missing} not found in {in_file_w_path}.")
+            column_idx = {name: header.index(name) for name in dtypes}
+        for i, row in enumerate(chunk, row_number + 1):
+            if row and len(row) < len(header):
+                raise ValueError(f"Row {i} of {in_file_w_path} has {len(row)} fields, "
+                                 f"expected {len(header)}.")
+        row_number += len(chunk)
+        # Blank lines come through csv as empty rows
+        chunk = [row for row in chunk if row]
+        if not chunk:
+            continue
+        cells = list(zip(*chunk))
+        for name, dtype in dtypes.items():
+            values = np.array(cells[column_idx[name]])
+            if dtype.kind == 'M':
+                columns[name].append(utils_time.parse_RFC3339_array(values).astype(dtype))
+            elif dtype.kind == 'b':
+                # astype(bool) on strings is True for any non-empty value
+                values = np.char.lower(np.char.strip(values))
+                is_true = np.isin(values, ('true', '1'))
+                invalid = ~(is_true | np.isin(values, ('false', '0')))
+                if invalid.any():
+                    raise ValueError(f"Invalid boolean value {values[invalid][0]!r} in "
+                                     f"column {name} of {in_file_w_path}.")
+                columns[name].append(is_true)
+            else:
+                columns[name].append(values.astype(dtype))
+
+    arrays = {name: np.concatenate(chunks) if chunks else np.empty(0, dtype=dtypes[name])
+              for name, chunks in columns.items()}
+    if as_dict:
+        return arrays
+
+    # String columns take the width of their longest value
+    table = np.empty(len(next(iter(arrays.values()), [])),
+                     dtype=[(name, array.dtype) for name, array in arrays.items()])
+    for name, array in arrays.items():
+        table[name] = array
+    return table
+
+
+def _find_csv_chunk_bounds(data, start: int, chunk_bytes: int) -> list:
+    """
+    Split data from start into byte ranges of about chunk_bytes, ending each on
+    a newline that is not inside a quoted field. A newline is inside quotes when
+    an odd number of quote characters precede it since the last boundary;
+    escaped quotes ('""') count twice and do not change the parity.
+    """
+    bounds = [start]
+    size = len(data)
+    while bounds[-1] < size:
+        pos = bounds[-1] + chunk_bytes
+        if pos >= size:
+            bounds.append(size)
+            break
+        in_quotes = data[bounds[-1]:pos].count(b'"') % 2 == 1
+        while True:
+            newline = data.find(b'\n', pos)
+            if newline < 0:
+                bounds.append(size)
+                break
+            if data[pos:newline].count(b'"') % 2 == 1:
+                in_quotes = not in_quotes
+            if not in_quotes:
+                bounds.append(newline + 1)
+                break
+            pos = newline + 1
+    return bounds
+
+
+def _parse_csv_chunk(task: tuple):
+    """
+    Parse the rows in one byte range of a CSV file into an array.
+    """
+    in_file_w_path, start, end, delimiter, dtype = task
+    with open(in_file_w_path, 'rb') as in_file, \
+            mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        text = data[start:end].decode('utf-8')
+    return np.array(list(csv.reader(io.StringIO(text, newline=''), delimiter=delimiter)), dtype=dtype)
+
+
+def read_csv_file_parallel(in_file_w_path: str,
+                           delimiter: str = ',',
+                           skip_rows: int = 0,
+                           dtype=None,
+                           max_workers: Optional[int] = None,
+                           chunk_bytes: int = 64 * 1024 * 1024):
+    """
+    Read CSV data from file at given path using a pool of processes. Append
+    '.csv' if not present.
+
+    With a dtype, the file is memory-mapped and split on newlines outside
+    quoted fields into chunks of about chunk_bytes, which are parsed into
+    arrays in parallel and returned in file order. The file must be UTF-8
+    encoded. Without a dtype, and for compressed files, the file is read
+    serially, since unpickling lists of rows from the workers takes longer
+    than parsing them in one process.
+
+    :param in_file_w_path: Path to read CSV data from
+    :param delimiter: Delimiter to use for CSV data
+    :param skip_rows: Number of leading lines to skip before reading (e.g. 1 for a header)
+    :param dtype: If given, return a 2D NumPy array of this dtype instead of lists of strings
+    :param max_workers: Number of worker processes, defaults to the number of CPUs
+    :param chunk_bytes: Approximate size in bytes of the chunk parsed by each task
+    :return: CSV data read from file, as a list of rows or a 2D array
+    """
+    in_file_w_path = add_suffix(in_file_w_path, '.csv', '.csv')
+    if dtype is None:
+        # Lists of rows cost more to send back from workers than to parse here
+        return list(iter_csv_file(in_file_w_path, delimiter=delimiter, skip_rows=skip_rows))
+    if get_compression(in_file_w_path):
+        # Compressed files cannot be memory-mapped or split, so stream them instead
+        rows = list(iter_csv_file(in_file_w_path, delimiter=delimiter, skip_rows=skip_rows))
+        return np.array(rows, dtype=dtype)
+    with open_file_at_path(in_file_w_path, 'rb') as in_file:
+        if Path(in_file_w_path).stat().st_size == 0:
+            return np.empty((0, 0), dtype=dtype)
+        with mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start = 0
+            for _ in range(skip_rows):
+                newline = data.find(b'\n', start)
+                start = len(data) if newline < 0 else newline + 1
+            bounds = _find_csv_chunk_bounds(data, start, chunk_bytes)
+
+    tasks = [(in_file_w_path, bounds[i], bounds[i + 1], delimiter, dtype)
+             for i in range(len(bounds) - 1)]
+    if len(tasks) <= 1:
+        chunks = [_parse_csv_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            chunks = list(executor.map(_parse_csv_chunk, tasks))
+
+    chunks = [chunk for chunk in chunks if chunk.size]
+    if not chunks:
+        return np.empty((0, 0), dtype=dtype)
+    return np.concatenate(chunks)
+
+
+
+class FileResult(NamedTuple):
+    """
+    Result of loading one file in a batch: the data, or the error raised while loading it.
+    """
+    path: str
+    data: object = None
+    error: Optional[Exception] = None
+
+
+def get_file_loader(file_path: str) -> Callable:
+    """
+    Get the function to read file at given path, based on its extension
+    (ignoring any compression extension).
+    """
+    compression = get_compression(file_path) or ''
+    base = file_path[:len(file_path) - len(compression)]
+    if base.endswith('.json'):
+        return read_json_file
+    if base.endswith(('.jsonl', '.ndjson')):
+        return lambda path: list(iter_jsonl_file(path))
+    if base.endswith('.csv'):
+        return read_csv_file
+    raise ValueError(f"No loader for file type of {file_path}.")
+
+
+def _expand_paths(paths) -> list:
+    """
+    Expand a glob pattern to sorted matching paths, or return a list of paths as given.
+    """
+    if isinstance(paths, (str, Path)):
+        return sorted(glob.glob(str(paths), recursive=True))
+    return [str(path) for path in paths]
+
+
+def _load_file(file_path: str, loader: Optional[Callable]) -> FileResult:
+    """
+    Load one file, capturing any error in the result instead of raising it.
+    """
+    try:
+        return FileResult(file_path, (loader or get_file_loader(file_path))(file_path))
+    except Exception as error:
+        return FileResult(file_path, error=error)
+
+
+def load_files(paths,
+               loader: Optional[Callable] = None,
+               max_workers: int = 8,
+               ordered: bool = True) -> Iterator[FileResult]:
+    """
+    Load many files concurrently with a bounded pool of threads.
+
+    :param paths: Glob pattern (e.g. 'data/*.json') or iterable of file paths
+    :param loader: Function to read each file, chosen by extension if not given
+    :param max_workers: Maximum number of files loaded at once
+    :param ordered: If True, yield results in the order of paths, otherwise as they complete
+    :return: Iterator over FileResult for each file, with per-file errors in FileResult.error
+    """
+    paths = _expand_paths(paths)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_load_file, path, loader) for path in paths]
+        for future in (futures if ordered else as_completed(futures)):
+            yield future.result()
+
+
+async def load_files_async(paths,
+                           loader: Optional[Callable] = None,
+                           max_concurrency: int = 8,
+                           ordered: bool = True) -> AsyncIterator[FileResult]:
+    """
+    Load many files concurrently from asyncio code, running each blocking read
+    in a worker thread so the event loop is not blocked.
+
+    :param paths: Glob pattern (e.g. 'data/*.json') or iterable of file paths
+    :param loader: Function to read each file, chosen by extension if not given
+    :param max_concurrency: Maximum number of files loaded at once
+    :param ordered: If True, yield results in the order of paths, otherwise as they complete
+    :return: Async iterator over FileResult for each file, with per-file errors in FileResult.error
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def load(path: str) -> FileResult:
+        async with semaphore:
+            return await asyncio.to_thread(_load_file, path, loader)
+
+    tasks = [asyncio.ensure_future(load(path)) for path in _expand_paths(paths)]
+    try:
+        for task in (tasks if ordered else asyncio.as_completed(tasks)):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
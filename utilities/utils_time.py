@@ -8,6 +8,7 @@ Created:    2025-01-30
 """
 
 from datetime import datetime
+import numpy as np
 
 
 def convert_datetime_to_RFC3339(input_datetime: datetime) -> str:
@@ -56,3 +57,193 @@ def get_datetime_from_RFC3339(timestamp: str) -> datetime:
     except Exception:
         print(f"Error! Unable to convert from RFC3339 datetime given {timestamp}")
         raise
+
+
+
+def convert_datetimes_to_RFC3339(input_datetimes) -> np.ndarray:
+    """
+    Get timestamp strings in RFC3339 format given many datetimes at once.
+    Vectorized counterpart of convert_datetime_to_RFC3339, giving identical
+    output for naive datetimes: fractional seconds truncated to two digits when
+    non-zero, 'Z' timezone. Timezone-aware datetimes are rejected, use
+    format_RFC3339 for those.
+
+    :param input_datetimes: list, ndarray or Series of naive datetimes or datetime64 values
+    :return: ndarray of RFC3339 formatted strings
+    """
+    try:
+        values = np.asarray(input_datetimes)
+        if values.dtype == object and any(getattr(value, 'tzinfo', None) is not None
+                                          for value in values.flat):
+            raise ValueError("Timezone-aware datetimes are not supported, use format_RFC3339")
+        values = values.astype('datetime64[us]')
+        missing = np.isnat(values)
+        if missing.any():
+            raise ValueError(f"Missing datetime (NaT) at index {np.flatnonzero(missing)[0]}")
+        seconds = values.astype('datetime64[s]')
+        microseconds = (values - seconds).astype(np.int64)
+        base = np.datetime_as_string(seconds, unit='s')
+        centiseconds = np.char.zfill((microseconds // 10000).astype(str), 2)
+        with_fraction = np.char.add(np.char.add(np.char.add(base, '.'), centiseconds), 'Z')
+        return np.where(microseconds > 0, with_fraction, np.char.add(base, 'Z'))
+    except ValueError as error:
+        print(f"Error! Invalid value to convert to RFC3339 datetimes: {error}")
+        raise
+    except Exception as error:
+        print(f"Error! Unable to convert to RFC3339 datetimes: {error}")
+        raise
+
+
+def get_datetimes_from_RFC3339(timestamps) -> np.ndarray:
+    """
+    Get datetime64[ns] array given many strings in RFC3339 timestamp format.
+    Vectorized counterpart of get_datetime_from_RFC3339, giving identical
+    values: fractional seconds are dropped and 'Z' timezone is required when
+    there is no fractional part.
+
+    :param timestamps: list, ndarray or Series of RFC3339 formatted strings
+    :return: ndarray of datetime64[ns] values
+    """
+    try:
+        values = np.asarray(timestamps, dtype=str)
+        fraction_idx = np.char.find(values, '.')
+        valid = (fraction_idx == 19) | ((np.char.str_len(values) == 20) & np.char.endswith(values, 'Z'))
+        # Separators checked as strptime would, numpy also accepting ' ' for 'T'
+        chars = values.astype('U19').view('U1').reshape(values.shape + (19,))
+        valid &= ((chars[..., 4] == '-') & (chars[..., 7] == '-') & (chars[..., 10] == 'T') &
+                  (chars[..., 13] == ':') & (chars[..., 16] == ':'))
+        if not valid.all():
+            raise ValueError(f"Invalid RFC3339 timestamp {values[~valid][0]}")
+        return values.astype('U19').astype('datetime64[s]').astype('datetime64[ns]')
+    except ValueError as error:
+        print(f"Error! Invalid value to convert from RFC3339 datetimes: {error}")
+        raise
+    except Exception as error:
+        print(f"Error! Unable to convert from RFC3339 datetimes: {error}")
+        raise
+
+
+
+def parse_RFC3339(timestamp: str) -> datetime:
+    """
+    Get timezone-aware Python datetime object given string in RFC3339 format.
+    RFC3339 format like '2025-02-28T00:00:00.123456+05:30' or '2025-02-28T00:00:00Z'.
+    Keeps fractional seconds of any precision (truncated to microseconds) and
+    numeric offsets, validating fixed-position fields by slicing, without strptime.
+
+    :param timestamp: RFC3339 formatted string
+    :return: timezone-aware Python datetime object
+    """
+    try:
+        if (len(timestamp) < 19 or timestamp[4] != '-' or timestamp[7] != '-' or
+                timestamp[10] not in 'Tt ' or timestamp[13] != ':' or timestamp[16] != ':'):
+            raise ValueError(f"Invalid RFC3339 timestamp {timestamp}")
+
+        # Normalize to the fixed layout fromisoformat accepts on all supported
+        # Python versions: six fraction digits and a numeric offset
+        if timestamp[-1] in 'Zz':
+            end = len(timestamp) - 1
+            offset = '+00:00'
+        else:
+            end = len(timestamp) - 6
+            offset = timestamp[end:]
+            if (end < 19 or offset[0] not in '+-' or offset[3] != ':' or
+                    not (offset[1:3] + offset[4:]).isdigit()):
+                raise ValueError(f"Invalid or missing offset in RFC3339 timestamp {timestamp}, "
+                                 "expected 'Z' or '+HH:MM'")
+        if end > 19:
+            fraction = timestamp[20:end]
+            if timestamp[19] != '.' or not fraction.isdigit():
+                raise ValueError(f"Invalid RFC3339 timestamp {timestamp}")
+            return datetime.fromisoformat(timestamp[:19] + '.' + fraction[:6].ljust(6, '0') + offset)
+        return datetime.fromisoformat(timestamp[:19] + offset)
+    except ValueError:
+        print(f"Error! Invalid value to convert from RFC3339 datetime given {timestamp}")
+        raise
+    except Exception:
+        print(f"Error! Unable to convert from RFC3339 datetime given {timestamp}")
+        raise
+
+
+def parse_RFC3339_array(timestamps) -> np.ndarray:
+    """
+    Get datetime64[ns] array in UTC given many strings in RFC3339 format.
+    Vectorized counterpart of parse_RFC3339: fractional seconds are kept (to
+    nanoseconds) and numeric offsets are converted to UTC.
+
+    :param timestamps: list, ndarray or Series of RFC3339 formatted strings
+    :return: ndarray of datetime64[ns] values in UTC
+    """
+    try:
+        values = np.asarray(timestamps, dtype=str).ravel()
+        if not len(values):
+            return np.empty(0, dtype='datetime64[ns]')
+        utc = np.char.endswith(values, 'Z') | np.char.endswith(values, 'z')
+        bases = np.where(utc, np.char.rstrip(values, 'Zz'), values).astype(values.dtype)
+        offset_minutes = np.zeros(len(values), dtype=np.int64)
+
+        # Offsets are rare in practice, so they are split off one by one
+        for i in np.flatnonzero(~utc):
+            timestamp = values[i]
+            offset = timestamp[-6:]
+            if (len(timestamp) < 25 or offset[0] not in '+-' or offset[3] != ':' or
+                    not (offset[1:3] + offset[4:]).isdigit()):
+                raise ValueError(f"Invalid or missing offset in RFC3339 timestamp {timestamp}, "
+                                 "expected 'Z' or '+HH:MM'")
+            bases[i] = timestamp[:-6]
+            minutes = int(offset[1:3]) * 60 + int(offset[4:])
+            offset_minutes[i] = minutes if offset[0] == '+' else -minutes
+
+        # Validate the fixed layout, which numpy alone would not enforce
+        parts = np.char.partition(np.char.replace(bases, 't', 'T'), '.')
+        heads = parts[:, 0]
+        chars = heads.astype('U19').view('U1').reshape(-1, 19)
+        valid = ((np.char.str_len(heads) == 19) &
+                 (chars[:, 4] == '-') & (chars[:, 7] == '-') &
+                 ((chars[:, 10] == 'T') | (chars[:, 10] == ' ')) &
+                 (chars[:, 13] == ':') & (chars[:, 16] == ':') &
+                 ((parts[:, 1] == '') | np.char.isdigit(parts[:, 2])))
+        if not valid.all():
+            raise ValueError(f"Invalid RFC3339 timestamp {values[~valid][0]}")
+
+        datetimes = np.char.add(np.char.add(heads, parts[:, 1]), parts[:, 2]).astype('datetime64[ns]')
+        return datetimes - offset_minutes.astype('timedelta64[m]')
+    except ValueError as error:
+        print(f"Error! Invalid value to convert from RFC3339 datetimes: {error}")
+        raise
+    except Exception as error:
+        print(f"Error! Unable to convert from RFC3339 datetimes: {error}")
+        raise
+
+
+def format_RFC3339(input_datetime: datetime, precision: int = 6) -> str:
+    """
+    Get timestamp string in RFC3339 format given Python datetime object, with
+    configurable sub-second precision. Naive datetimes are taken as UTC.
+    RFC3339 format like '2025-02-28T00:00:00.123456Z' or '2025-02-28T00:00:00.123+05:30'.
+
+    :param input_datetime: Python datetime object
+    :param precision: Number of fractional second digits, from 0 to 6
+    :return: RFC3339 formatted string
+    """
+    try:
+        if not 0 <= precision <= 6:
+            raise ValueError(f"Precision must be between 0 and 6, given {precision}")
+
+        rfc_datetime = (f"{input_datetime.year:04d}-{input_datetime.month:02d}-{input_datetime.day:02d}T"
+                        f"{input_datetime.hour:02d}:{input_datetime.minute:02d}:{input_datetime.second:02d}")
+        if precision:
+            rfc_datetime += f".{input_datetime.microsecond:06d}"[:precision + 1]
+
+        offset = input_datetime.utcoffset()
+        if not offset:
+            return rfc_datetime + "Z"
+        minutes = int(offset.total_seconds()) // 60
+        sign = '+' if minutes >= 0 else '-'
+        return rfc_datetime + f"{sign}{abs(minutes) // 60:02d}:{abs(minutes) % 60:02d}"
+    except ValueError:
+        print(f"Error! Invalid value to convert to RFC3339 datetime given {input_datetime}")
+        raise
+    except Exception:
+        print(f"Error! Unable to convert to RFC3339 datetime given {input_datetime}")
+        raise